@@ -0,0 +1,77 @@
+"""initial schema
+
+Revision ID: 4b1f0c2a9d10
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+Matches the tables previously created by Base.metadata.create_all, so an
+existing database can be adopted with `alembic stamp 4b1f0c2a9d10`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1f0c2a9d10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('password', sa.String(), nullable=True),
+        sa.Column('full_name', sa.String(), nullable=True),
+        sa.Column('user_type', sa.Enum('STUDENT', 'ADMIN', 'MANAGER', name='usertype'), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('email_verified', sa.Boolean(), nullable=True),
+        sa.Column('verification_token', sa.String(), nullable=True),
+        sa.Column('verification_token_expires', sa.DateTime(), nullable=True),
+        sa.Column('reset_token', sa.String(), nullable=True),
+        sa.Column('reset_token_expires', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_table(
+        'students',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=True),
+        sa.Column('school', sa.String(), nullable=True),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.Column('economic_status', sa.Enum('POOR', 'MEDIUM', 'RICH', name='economicstatus'), nullable=True),
+        sa.Column('disability_status', sa.Enum('DISABLED', 'NOT_DISABLED', name='disabilitystatus'), nullable=True),
+        sa.ForeignKeyConstraint(['id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'financial_aids',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=True),
+        sa.Column('amount', sa.Integer(), nullable=True),
+        sa.Column('purpose', sa.String(), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'APPROVED', 'REJECTED', name='applicationstatus'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['student_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_financial_aids_id', 'financial_aids', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_financial_aids_id', table_name='financial_aids')
+    op.drop_table('financial_aids')
+    op.drop_table('students')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='applicationstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='disabilitystatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='economicstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='usertype').drop(op.get_bind(), checkfirst=True)
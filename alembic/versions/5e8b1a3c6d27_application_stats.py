@@ -0,0 +1,36 @@
+"""application stats
+
+Revision ID: 5e8b1a3c6d27
+Revises: d2a7e4b9c815
+Create Date: 2026-10-18 10:30:00.000000
+
+Populate existing data afterwards with `python -m app.stats rebuild`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8b1a3c6d27'
+down_revision: Union[str, None] = 'd2a7e4b9c815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'application_stats',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('value', sa.String(), nullable=False),
+        sa.Column('status', postgresql.ENUM('PENDING', 'APPROVED', 'REJECTED', name='applicationstatus', create_type=False), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dimension', 'value', 'status'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('application_stats')
@@ -0,0 +1,28 @@
+"""ranking refresh index
+
+Revision ID: 7d4c2b9e1f53
+Revises: a61f3d8e2b94
+Create Date: 2026-10-18 13:00:00.000000
+
+Index on financial_aids.updated_at for the incremental refresh of the
+review queue ranking, which reads rows changed since its last pass.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4c2b9e1f53'
+down_revision: Union[str, None] = 'a61f3d8e2b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_financial_aids_updated_at', 'financial_aids', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_financial_aids_updated_at', table_name='financial_aids')
@@ -0,0 +1,45 @@
+"""hot path indexes
+
+Revision ID: 9c3e5d7a2f41
+Revises: 4b1f0c2a9d10
+Create Date: 2026-10-18 09:30:00.000000
+
+Composite indexes for the per-student and per-status application lists
+and the keyset pagination order, plus partial indexes covering only the
+users that still hold a verification or reset token.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e5d7a2f41'
+down_revision: Union[str, None] = '4b1f0c2a9d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_financial_aids_student_id_created_at', 'financial_aids', ['student_id', 'created_at'], unique=False)
+    op.create_index('ix_financial_aids_status_created_at', 'financial_aids', ['status', 'created_at'], unique=False)
+    op.create_index('ix_financial_aids_created_at_id', 'financial_aids', ['created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_users_verification_token', 'users', ['verification_token'], unique=False,
+        postgresql_where=sa.text('verification_token IS NOT NULL'),
+        sqlite_where=sa.text('verification_token IS NOT NULL'),
+    )
+    op.create_index(
+        'ix_users_reset_token', 'users', ['reset_token'], unique=False,
+        postgresql_where=sa.text('reset_token IS NOT NULL'),
+        sqlite_where=sa.text('reset_token IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_reset_token', table_name='users')
+    op.drop_index('ix_users_verification_token', table_name='users')
+    op.drop_index('ix_financial_aids_created_at_id', table_name='financial_aids')
+    op.drop_index('ix_financial_aids_status_created_at', table_name='financial_aids')
+    op.drop_index('ix_financial_aids_student_id_created_at', table_name='financial_aids')
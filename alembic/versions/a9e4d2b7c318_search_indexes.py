@@ -0,0 +1,52 @@
+"""search indexes
+
+Revision ID: a9e4d2b7c318
+Revises: f1a6c3d8e472
+Create Date: 2026-10-18 18:00:00.000000
+
+GIN indexes behind GET /managers/applications/search on PostgreSQL:
+'simple' tsvectors of names, places and purposes, and pg_trgm trigrams of
+names, schools and locations. Other databases search an in-memory index
+and get nothing here.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e4d2b7c318'
+down_revision: Union[str, None] = 'f1a6c3d8e472'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = (
+    ('ix_users_full_name_trgm', 'users', 'full_name'),
+    ('ix_students_school_trgm', 'students', 'school'),
+    ('ix_students_location_trgm', 'students', 'location'),
+)
+TSVECTOR_INDEXES = (
+    ('ix_users_full_name_tsv', 'users', "to_tsvector('simple', coalesce(full_name, ''))"),
+    ('ix_students_place_tsv', 'students',
+     "to_tsvector('simple', coalesce(school, '') || ' ' || coalesce(location, ''))"),
+    ('ix_financial_aids_purpose_tsv', 'financial_aids', "to_tsvector('simple', coalesce(purpose, ''))"),
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+    for name, table, expression in TSVECTOR_INDEXES:
+        op.create_index(name, table, [sa.text(expression)], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, _ in TSVECTOR_INDEXES + TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table)
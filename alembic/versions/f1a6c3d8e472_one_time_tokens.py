@@ -0,0 +1,98 @@
+"""one time tokens
+
+Revision ID: f1a6c3d8e472
+Revises: c4d9e1f7b265
+Create Date: 2026-10-18 17:00:00.000000
+
+Moves verification and reset tokens off users into one_time_tokens,
+keyed by their SHA-256. Outstanding tokens are carried over, so emailed
+links keep working. Downgrading cannot recover tokens from their hashes;
+users then have to request a new link.
+"""
+from typing import Sequence, Union
+from datetime import datetime
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a6c3d8e472'
+down_revision: Union[str, None] = 'c4d9e1f7b265'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    one_time_tokens = op.create_table(
+        'one_time_tokens',
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('purpose', sa.Enum('VERIFY_EMAIL', 'RESET_PASSWORD', name='tokenpurpose'), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('token_hash'),
+    )
+    op.create_index('ix_one_time_tokens_user_id_purpose', 'one_time_tokens', ['user_id', 'purpose'], unique=False)
+    op.create_index('ix_one_time_tokens_expires_at', 'one_time_tokens', ['expires_at'], unique=False)
+
+    users = sa.table(
+        'users',
+        sa.column('id', sa.Integer),
+        sa.column('verification_token', sa.String),
+        sa.column('verification_token_expires', sa.DateTime),
+        sa.column('reset_token', sa.String),
+        sa.column('reset_token_expires', sa.DateTime),
+    )
+    now = datetime.utcnow()
+    rows = []
+    for purpose, token_column, expires_column in (
+        ('VERIFY_EMAIL', users.c.verification_token, users.c.verification_token_expires),
+        ('RESET_PASSWORD', users.c.reset_token, users.c.reset_token_expires),
+    ):
+        outstanding = op.get_bind().execute(
+            sa.select(users.c.id, token_column, expires_column)
+            .where(token_column.isnot(None), expires_column > now)
+        )
+        rows += [
+            {
+                'token_hash': hashlib.sha256(token.encode()).hexdigest(),
+                'purpose': purpose,
+                'user_id': user_id,
+                'expires_at': expires_at,
+            }
+            for user_id, token, expires_at in outstanding
+        ]
+    if rows:
+        op.bulk_insert(one_time_tokens, rows)
+
+    op.drop_index('ix_users_reset_token', table_name='users')
+    op.drop_index('ix_users_verification_token', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('reset_token_expires')
+        batch_op.drop_column('reset_token')
+        batch_op.drop_column('verification_token_expires')
+        batch_op.drop_column('verification_token')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('verification_token', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('verification_token_expires', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('reset_token', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('reset_token_expires', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_users_verification_token', 'users', ['verification_token'], unique=False,
+        postgresql_where=sa.text('verification_token IS NOT NULL'),
+        sqlite_where=sa.text('verification_token IS NOT NULL'),
+    )
+    op.create_index(
+        'ix_users_reset_token', 'users', ['reset_token'], unique=False,
+        postgresql_where=sa.text('reset_token IS NOT NULL'),
+        sqlite_where=sa.text('reset_token IS NOT NULL'),
+    )
+    op.drop_index('ix_one_time_tokens_expires_at', table_name='one_time_tokens')
+    op.drop_index('ix_one_time_tokens_user_id_purpose', table_name='one_time_tokens')
+    op.drop_table('one_time_tokens')
+    sa.Enum(name='tokenpurpose').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,206 @@
+"""Admission control: bounded concurrency per route class and login throttling.
+
+Every request is put in one of five classes (auth, read, write, admin,
+stream). Each class has its own concurrency limit, a bounded number of
+waiters and a queue timeout. A bcrypt storm on /auth/login therefore waits behind
+other logins only, and cheap reads keep flowing. Past those limits the
+request gets an immediate 503 with Retry-After instead of queueing.
+
+WebSocket connections are held to the stream class for as long as they
+stay open; over the limit they are closed at once with code 1013 (try
+again later).
+
+/auth/login and /auth/forgot-password are additionally throttled per
+client address with a token bucket, answering 429 with Retry-After.
+"""
+from starlette.responses import JSONResponse
+from starlette.websockets import WebSocket
+from dotenv import load_dotenv
+from .cache import TTLCache
+import asyncio
+import math
+import os
+import time
+
+load_dotenv()
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+
+def _class_settings(name: str, limit: int, queue: int, timeout: float):
+    prefix = f"ADMISSION_{name.upper()}_"
+    return (
+        int(os.getenv(prefix + "CONCURRENCY", str(limit))),
+        int(os.getenv(prefix + "QUEUE", str(queue))),
+        float(os.getenv(prefix + "QUEUE_TIMEOUT", str(timeout))),
+    )
+
+# (concurrency, waiting requests, seconds a request may wait); concurrency 0 disables the limit
+ROUTE_CLASSES = {
+    "auth": _class_settings("auth", 8, 32, 2.0),
+    "read": _class_settings("read", 64, 256, 1.0),
+    "write": _class_settings("write", 32, 128, 2.0),
+    "admin": _class_settings("admin", 4, 8, 5.0),
+    # Long-lived event streams: a cap on open connections, never queued
+    "stream": _class_settings("stream", 1000, 0, 0),
+}
+
+# (requests per minute, burst) per client address
+THROTTLED_PATHS = {
+    "/auth/login": (
+        float(os.getenv("LOGIN_RATE_PER_MINUTE", "10")),
+        int(os.getenv("LOGIN_BURST", "5")),
+    ),
+    "/auth/forgot-password": (
+        float(os.getenv("FORGOT_PASSWORD_RATE_PER_MINUTE", "3")),
+        int(os.getenv("FORGOT_PASSWORD_BURST", "3")),
+    ),
+}
+THROTTLE_MAX_CLIENTS = int(os.getenv("THROTTLE_MAX_CLIENTS", "100000"))
+
+# Endpoints that hash a password run in the auth class wherever they live
+PASSWORD_HASHING_PATHS = {"/admin/initial-admin", "/admin/admins"}
+STREAMING_PATHS = {"/students/applications/events"}
+# Token endpoints that never hash a password stay out of the auth class
+CHEAP_AUTH_PATHS = {"/auth/refresh", "/auth/logout"}
+
+def classify(method: str, path: str) -> str:
+    if path in STREAMING_PATHS:
+        return "stream"
+    if method == "POST" and path in CHEAP_AUTH_PATHS:
+        return "write"
+    if method == "POST" and (path.startswith("/auth/") or path in PASSWORD_HASHING_PATHS):
+        return "auth"
+    if path.startswith("/admin/"):
+        return "admin"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+class ConcurrencyLimit:
+    """A semaphore that sheds load once too many requests wait or they wait too long."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._semaphore = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        retry_after = max(1, math.ceil(self.queue_timeout))
+        if self.waiting >= self.max_queue:
+            raise Overloaded(retry_after)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(retry_after)
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+class TokenBucket:
+    """Per-key token buckets; idle keys expire once their bucket would be full again."""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._buckets = TTLCache(THROTTLE_MAX_CLIENTS, burst / self.rate if self.rate > 0 else 0)
+
+    def take(self, key) -> float:
+        """Consume a token; return 0 when allowed, else the seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now))
+            return (1 - tokens) / self.rate
+        self._buckets.set(key, (tokens - 1, now))
+        return 0
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.limits = {
+            name: ConcurrencyLimit(limit, queue, timeout)
+            for name, (limit, queue, timeout) in ROUTE_CLASSES.items()
+            if limit > 0
+        }
+        self.buckets = {
+            path: TokenBucket(per_minute, burst)
+            for path, (per_minute, burst) in THROTTLED_PATHS.items()
+            if per_minute > 0
+        }
+
+    async def __call__(self, scope, receive, send):
+        if not ADMISSION_CONTROL:
+            await self.app(scope, receive, send)
+            return
+        if scope["type"] == "websocket":
+            await self._admit_websocket(scope, receive, send)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        bucket = self.buckets.get(scope["path"])
+        if bucket is not None and scope["method"] == "POST":
+            client = scope["client"][0] if scope.get("client") else None
+            wait = bucket.take(client)
+            if wait:
+                response = JSONResponse(
+                    {"detail": "Too many requests, please retry later"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+
+        limit = self.limits.get(classify(scope["method"], scope["path"]))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limit.acquire()
+        except Overloaded as exc:
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+    async def _admit_websocket(self, scope, receive, send):
+        """Hold a stream slot until the connection closes."""
+        limit = self.limits.get("stream")
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limit.acquire()
+        except Overloaded:
+            websocket = WebSocket(scope, receive, send)
+            # Accepted first, so the client sees the close code rather than a failed handshake
+            await websocket.accept()
+            await websocket.close(code=1013, reason="Server is busy, please retry shortly")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
@@ -1,21 +1,313 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from dotenv import load_dotenv
+from .cache import TTLCache
+from .instrumentation import record_query
+import itertools
+import logging
+import math
 import os
+import time
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# "sync" runs the blocking Session in the threadpool, "async" uses asyncpg/aiosqlite
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+# Comma separated; read-only endpoints are spread over these when set
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STRATEGY = os.getenv("REPLICA_STRATEGY", "round_robin").lower()
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# A user's reads stay on the primary this long after they commit a write
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+def get_async_url(url: str) -> str:
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+def instrument_engine(sync_engine):
+    """Feed every statement's count and duration into the current request's metrics."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_query(statement, time.perf_counter() - conn.info["query_start_time"].pop())
+
+# Set by get_current_user so commits can be attributed to the requesting user
+current_user_id: ContextVar = ContextVar("current_user_id", default=None)
+recent_writers = TTLCache(100000, READ_YOUR_WRITES_SECONDS)
+# Per request, a one-item list with the epoch time of the client's last commit, if any.
+# A list rather than the value, so commits made from the threadpool still update it.
+client_last_write: ContextVar = ContextVar("client_last_write", default=None)
+READ_YOUR_WRITES_COOKIE = "last_write"
+
+class PrimarySession(Session):
+    """Session class for the primary; its commits start the read-your-writes window."""
+
+def remember_write(user_id=None):
+    """Start the read-your-writes window for this user and, through its cookie, this client."""
+    if user_id is not None:
+        recent_writers.set(user_id, True)
+    last_write = client_last_write.get()
+    if last_write is not None:
+        last_write[0] = time.time()
+
+@event.listens_for(PrimarySession, "after_commit")
+def remember_writer(session):
+    remember_write(current_user_id.get())
+
+def _wrote_recently() -> bool:
+    user_id = current_user_id.get()
+    if user_id is not None and recent_writers.get(user_id):
+        return True
+    # Another worker may have taken the write; the client's cookie says when
+    last_write = client_last_write.get()
+    return (
+        last_write is not None and last_write[0] is not None
+        and abs(time.time() - last_write[0]) < READ_YOUR_WRITES_SECONDS
+    )
+
+class ReadYourWritesMiddleware:
+    """Carries the read-your-writes window in a cookie, so it holds across worker processes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookies = cookie_parser(Headers(scope=scope).get("cookie", ""))
+        try:
+            received = float(cookies[READ_YOUR_WRITES_COOKIE])
+        except (KeyError, ValueError):
+            received = None
+        last_write = [received]
+        token = client_last_write.set(last_write)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and last_write[0] != received:
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie",
+                    f"{READ_YOUR_WRITES_COOKIE}={last_write[0]:.3f}; Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            client_last_write.reset(token)
 
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
+SessionLocal = sessionmaker(
+    class_=PrimarySession, autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    async_engine = create_async_engine(get_async_url(DATABASE_URL))
+    instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, sync_session_class=PrimarySession, autoflush=False, expire_on_commit=False
+    )
+
+class Replica:
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.in_use = 0
+        self.down_until = 0.0
+        # pre_ping turns a dead replica into an error at checkout, before any query ran
+        self.engine = create_engine(url, pool_pre_ping=True)
+        instrument_engine(self.engine)
+        self.session_factory = sessionmaker(autoflush=False, expire_on_commit=False, bind=self.engine)
+        self.async_session_factory = None
+        if DB_MODE == "async":
+            replica_async_engine = create_async_engine(get_async_url(url), pool_pre_ping=True)
+            instrument_engine(replica_async_engine.sync_engine)
+            self.async_session_factory = async_sessionmaker(
+                replica_async_engine, autoflush=False, expire_on_commit=False
+            )
+
+class ReplicaPool:
+    """Picks a replica per read session and skips replicas that recently failed."""
+
+    def __init__(self, urls, strategy: str):
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self._turn = itertools.count()
+
+    def choose(self):
+        now = time.monotonic()
+        healthy = [replica for replica in self.replicas if replica.down_until <= now]
+        if not healthy:
+            return None
+        if self.strategy == "least_connections":
+            return min(healthy, key=lambda replica: replica.in_use)
+        return healthy[next(self._turn) % len(healthy)]
+
+    def mark_down(self, replica: Replica, exc: Exception):
+        replica.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+        logger.warning("Replica %s failed, using the primary for %ss: %s", replica.name, REPLICA_RETRY_SECONDS, exc)
+
+replica_pool = ReplicaPool(DATABASE_REPLICA_URLS, REPLICA_STRATEGY)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def dialect_insert(entity):
+    """INSERT construct with on_conflict_do_update for the configured backend."""
+    if engine.dialect.name == "postgresql":
+        return postgresql_insert(entity)
+    return sqlite_insert(entity)
+
+class SyncSession:
+    """Awaitable facade over a blocking Session so routers are written once for both modes."""
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def _execute(self, statement, params=None, **kwargs):
+        result = self.sync_session.execute(statement, params, **kwargs)
+        if isinstance(result, CursorResult) and not result.returns_rows:
+            return result
+        # fetch rows inside the worker thread, like AsyncSession does
+        try:
+            return result.freeze()()
+        except NotImplementedError:
+            # ORM executemany without RETURNING has no rows to buffer
+            return result
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self._execute, statement, params, **kwargs)
+
+    async def stream(self, statement, params=None, **kwargs):
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+        return SyncStreamResult(result)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalar()
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def connection(self, **kwargs):
+        return await run_in_threadpool(self.sync_session.connection, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+class SyncStreamResult:
+    """Counterpart of AsyncResult for streamed results of the sync facade."""
+
+    def __init__(self, result):
+        self._result = result
+
+    def partitions(self, size=None):
+        return iterate_in_threadpool(self._result.partitions(size))
+
+    async def close(self):
+        await run_in_threadpool(self._result.close)
+
+def new_session(session_factory=SessionLocal, async_session_factory=None):
+    if DB_MODE == "async":
+        return (async_session_factory or AsyncSessionLocal)()
+    return SyncSession(session_factory())
+
+@asynccontextmanager
+async def open_session():
+    db = new_session()
     try:
         yield db
-    finally: 
-        db.close()
\ No newline at end of file
+    finally:
+        await db.close()
+
+async def _open_replica_session():
+    """A connected session on a healthy replica, or None to use the primary."""
+    if _wrote_recently():
+        return None, None
+    while (replica := replica_pool.choose()) is not None:
+        db = new_session(replica.session_factory, replica.async_session_factory)
+        try:
+            await db.connection()
+            return replica, db
+        except DBAPIError as exc:
+            await db.close()
+            replica_pool.mark_down(replica, exc)
+    return None, None
+
+@asynccontextmanager
+async def open_read_session():
+    """Session for read-only work, routed to a replica when one is configured and healthy."""
+    replica, db = await _open_replica_session()
+    if replica is None:
+        async with open_session() as db:
+            yield db
+        return
+
+    replica.in_use += 1
+    try:
+        yield db
+    except DBAPIError as exc:
+        if exc.connection_invalidated:
+            replica_pool.mark_down(replica, exc)
+        raise
+    finally:
+        replica.in_use -= 1
+        await db.close()
+
+async def get_db():
+    async with open_session() as db:
+        yield db
+
+async def get_read_db():
+    async with open_read_session() as db:
+        yield db
@@ -0,0 +1,94 @@
+"""Conditional GET for list endpoints.
+
+Writers bump a version per scope ("applications", "users",
+"student:<id>") inside their transaction. Readers derive a strong ETag
+from those versions and the request URL, so If-None-Match can be answered
+with a single primary-key lookup instead of re-running the list query.
+"""
+from fastapi import Request, Response
+from functools import lru_cache
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from dotenv import load_dotenv
+from .cache import TTLCache
+from .database import dialect_insert
+from .instrumentation import timed
+from .responses import FAST_RESPONSES, dumps
+from .models import models
+import hashlib
+import os
+
+load_dotenv()
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+APPLICATIONS = "applications"
+USERS = "users"
+
+def student_scope(student_id: int) -> str:
+    return f"student:{student_id}"
+
+# Serialized bodies keyed by ETag; a new version simply stops being asked for
+response_cache = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+async def bump_versions(db, *scopes):
+    """Invalidate every ETag derived from these scopes once the caller commits."""
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    statement = dialect_insert(models.CacheVersion)
+    statement = statement.on_conflict_do_update(
+        index_elements=["scope"],
+        set_={"version": models.CacheVersion.version + 1},
+    )
+    await db.execute(statement, [{"scope": scope, "version": 1} for scope in scopes])
+
+async def current_etag(db, request: Request, *scopes) -> str:
+    rows = await db.execute(
+        select(models.CacheVersion.scope, models.CacheVersion.version)
+        .where(models.CacheVersion.scope.in_(scopes))
+    )
+    versions = dict(rows.all())
+    key = "|".join([str(request.url.path), str(request.query_params)] + [
+        f"{scope}={versions.get(scope, 0)}" for scope in sorted(scopes)
+    ])
+    return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+@lru_cache(maxsize=None)
+def _adapter(response_model):
+    return TypeAdapter(response_model)
+
+def cached_response(etag: str):
+    body = response_cache.get(etag)
+    if body is None:
+        return None
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+def etag_response(etag: str, response_model, content) -> Response:
+    """Serialize as response_model would, remember the body and tag the response."""
+    with timed("serialize"):
+        if FAST_RESPONSES:
+            # Trusted: built by the endpoint from typed columns, no re-validation
+            body = dumps(content)
+        else:
+            adapter = _adapter(response_model)
+            body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    response_cache.set(etag, body)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+async def conditional_get(db, request: Request, *scopes):
+    """Return (etag, early_response); early_response is a 304 or a cached body, else None."""
+    etag = await current_etag(db, request, *scopes)
+    if not_modified(request, etag):
+        return etag, Response(status_code=304, headers={"ETag": etag})
+    return etag, cached_response(etag)
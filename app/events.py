@@ -0,0 +1,112 @@
+"""Application status change notifications.
+
+Status updates publish an event per application after their commit, on
+the owning student's channel. The SSE and WebSocket endpoints in
+app/routers/events.py subscribe to that channel for as long as the
+client stays connected.
+
+Events travel through a broker. LocalBroker fans out inside this process,
+which is enough for a single worker and for tests. With several workers,
+set EVENT_BROKER to the "module:Class" path of a Broker subclass backed by
+something shared, such as Redis pub/sub or PostgreSQL LISTEN/NOTIFY.
+"""
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+import asyncio
+import importlib
+import logging
+import os
+
+load_dotenv()
+
+EVENT_BROKER = os.getenv("EVENT_BROKER", "local")
+# Per subscriber; when a slow client falls this far behind the oldest events are dropped
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+
+logger = logging.getLogger(__name__)
+
+def student_channel(student_id: int) -> str:
+    return f"student:{student_id}"
+
+class Broker(ABC):
+    """Interface between publishers and the subscribers connected to this worker."""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict):
+        ...
+
+    @abstractmethod
+    def subscribe(self, channel: str):
+        """Async context manager yielding a Subscription for `channel`."""
+
+    @abstractmethod
+    async def close(self):
+        """Release connections to the backend; called on shutdown."""
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, message: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: float = None):
+        """The next message, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class LocalBroker(Broker):
+    """In-process fan-out; subscribers only see events published by the same worker."""
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.channels = {}
+
+    async def publish(self, channel: str, message: dict):
+        for subscription in list(self.channels.get(channel, ())):
+            subscription.deliver(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        subscription = Subscription(self.queue_size)
+        self.channels.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self.channels.get(channel)
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.channels[channel]
+
+    async def close(self):
+        pass
+
+def load_broker(path: str) -> Broker:
+    if path == "local":
+        return LocalBroker()
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+broker = load_broker(EVENT_BROKER)
+
+async def publish_status_changes(changes):
+    """Notify students of committed (student_id, application_id, status, updated_at) changes.
+
+    The change is already committed, so a broker failure is logged rather
+    than turned into an error response.
+    """
+    for student_id, application_id, status, updated_at in changes:
+        message = {
+            "id": application_id,
+            "status": status.value,
+            "updated_at": updated_at.isoformat() if updated_at else None,
+        }
+        try:
+            await broker.publish(student_channel(student_id), message)
+        except Exception:
+            logger.exception("Could not publish status change of application %s", application_id)
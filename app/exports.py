@@ -0,0 +1,87 @@
+from sqlalchemy import select
+from datetime import datetime
+from dotenv import load_dotenv
+from .database import open_read_session
+from .models import models
+import csv
+import enum
+import io
+import json
+import os
+
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_COLUMNS = [
+    "id", "student_id", "full_name", "email", "amount", "purpose", "status",
+    "created_at", "updated_at", "age", "school", "location",
+    "economic_status", "disability_status",
+]
+
+def application_export_query(status=None):
+    """Plain column tuples (no ORM identities) so streaming keeps memory flat."""
+    students = models.Student.__table__
+    query = (
+        select(
+            models.FinancialAid.id,
+            models.FinancialAid.student_id,
+            models.User.full_name,
+            models.User.email,
+            models.FinancialAid.amount,
+            models.FinancialAid.purpose,
+            models.FinancialAid.status,
+            models.FinancialAid.created_at,
+            models.FinancialAid.updated_at,
+            students.c.age,
+            students.c.school,
+            students.c.location,
+            students.c.economic_status,
+            students.c.disability_status,
+        )
+        .join(models.User, models.User.id == models.FinancialAid.student_id)
+        .outerjoin(students, students.c.id == models.FinancialAid.student_id)
+        .order_by(models.FinancialAid.created_at, models.FinancialAid.id)
+    )
+    if status is not None:
+        query = query.where(models.FinancialAid.status == status)
+    return query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def format_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, map(_plain, row)))) + "\n" for row in rows
+    )
+
+def format_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([_plain(v) for v in row] for row in rows)
+    return buffer.getvalue()
+
+async def stream_applications(export_format: str, status=None):
+    """Yield one encoded chunk per fetched batch from a server-side cursor.
+
+    The session is opened here rather than taken from get_db because the
+    body is produced after the endpoint has returned.
+    """
+    async with open_read_session() as db:
+        result = await db.stream(application_export_query(status))
+        try:
+            if export_format == "csv":
+                yield format_csv([], header=True)
+            async for rows in result.partitions(EXPORT_BATCH_SIZE):
+                if export_format == "csv":
+                    yield format_csv(rows)
+                else:
+                    yield format_ndjson(rows)
+        finally:
+            await result.close()
@@ -0,0 +1,190 @@
+"""Group commit for aid applications.
+
+With GROUP_COMMIT enabled, POST /students/apply hands its application to
+a batcher instead of committing it itself. Submissions arriving within
+GROUP_COMMIT_LINGER_MS of the first one, up to GROUP_COMMIT_MAX_BATCH,
+are written with one executemany INSERT ... RETURNING (a single
+multi-row statement on PostgreSQL), one stats update and one commit, so a
+burst of submissions pays for one fsync instead of one each. Every caller
+waits for its own row, matched by position.
+
+If the batch fails on a constraint, typically an Idempotency-Key that a
+concurrent retry committed first, its submissions are retried one by one
+so only the conflicting one fails.
+
+Batch fill is logged as a JSON line on "app.group_commit" at most every
+GROUP_COMMIT_REPORT_SECONDS, and each request reports its wait as the
+group_commit Server-Timing span.
+"""
+from fastapi import status
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from collections import Counter
+from dotenv import load_dotenv
+from .database import open_session
+from .etags import APPLICATIONS, bump_versions, student_scope
+from .models import models
+from .responses import rows_to_dicts, schema_columns
+from .schemas import schemas
+from .stats import record_changes
+from . import idempotency
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+
+load_dotenv()
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+GROUP_COMMIT_LINGER_MS = float(os.getenv("GROUP_COMMIT_LINGER_MS", "2"))
+GROUP_COMMIT_REPORT_SECONDS = float(os.getenv("GROUP_COMMIT_REPORT_SECONDS", "60"))
+
+logger = logging.getLogger("app.group_commit")
+
+class Submission:
+    __slots__ = ("user_id", "values", "idempotency", "future")
+
+    def __init__(self, user_id: int, values: dict, idempotency, future):
+        self.user_id = user_id
+        self.values = values
+        self.idempotency = idempotency
+        self.future = future
+
+    def resolve(self, result):
+        # The caller may have gone away; the application is committed regardless
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def fail(self, exc: BaseException):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+class BatchStats:
+    """Batch fill since the last report."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.monotonic()
+        self.fills = Counter()
+        self.full = 0
+        self.retried = 0
+
+    def record(self, size: int, full: bool):
+        self.fills[size] += 1
+        self.full += full
+
+    def snapshot(self) -> dict:
+        batches = sum(self.fills.values())
+        submissions = sum(size * count for size, count in self.fills.items())
+        return {
+            "seconds": round(time.monotonic() - self.started, 1),
+            "batches": batches,
+            "submissions": submissions,
+            "mean_fill": round(submissions / batches, 2) if batches else 0,
+            "max_fill": max(self.fills, default=0),
+            "full_batches": self.full,
+            "retried_batches": self.retried,
+            "fills": dict(sorted(self.fills.items())),
+        }
+
+class GroupCommitter:
+    def __init__(self, max_batch: int = GROUP_COMMIT_MAX_BATCH, linger_ms: float = GROUP_COMMIT_LINGER_MS):
+        self.max_batch = max(1, max_batch)
+        self.linger = linger_ms / 1000
+        self.pending = []
+        self.stats = BatchStats()
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, user_id: int, values: dict, idempotency=None):
+        """Queue one application and wait for its commit.
+
+        Returns the application as a dict, or its serialized body when a
+        (key, payload_hash) pair is given, since that body is what gets stored.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(Submission(user_id, values, idempotency, future))
+        if len(self.pending) >= self.max_batch:
+            self._flush(full=True)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self, full: bool = False):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        self.stats.record(len(batch), full)
+        # A clean context, so the batch is not charged to whichever request filled it
+        task = asyncio.get_running_loop().create_task(self._write(batch), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, batch: list):
+        try:
+            results = await self._commit(batch)
+        except IntegrityError as exc:
+            if len(batch) == 1:
+                batch[0].fail(exc)
+                return
+            self.stats.retried += 1
+            for submission in batch:
+                await self._write([submission])
+            return
+        except Exception as exc:
+            for submission in batch:
+                submission.fail(exc)
+            return
+        for submission, result in zip(batch, results):
+            if submission.idempotency is not None:
+                key, payload_hash = submission.idempotency
+                idempotency.remember_committed(submission.user_id, key, payload_hash, status.HTTP_200_OK, result)
+            submission.resolve(result)
+        self._report()
+
+    async def _commit(self, batch: list) -> list:
+        aids = models.FinancialAid.__table__
+        async with open_session() as db:
+            # executemany; rows come back in submission order
+            result = await db.execute(
+                insert(aids).returning(*schema_columns(schemas.FinancialAid, aids.c), sort_by_parameter_order=True),
+                [dict(s.values, student_id=s.user_id) for s in batch],
+            )
+            rows = rows_to_dicts(result.all(), schemas.FinancialAid)
+
+            pending = models.ApplicationStatus.PENDING
+            await record_changes(db, [(s.user_id, s.values["amount"], None, pending) for s in batch])
+            await bump_versions(db, APPLICATIONS, *(student_scope(s.user_id) for s in batch))
+            results = []
+            for submission, row in zip(batch, rows):
+                if submission.idempotency is None:
+                    results.append(row)
+                    continue
+                key, payload_hash = submission.idempotency
+                body = schemas.FinancialAid(**row).model_dump_json().encode()
+                idempotency.remember(db, submission.user_id, key, payload_hash, status.HTTP_200_OK, body)
+                results.append(body)
+            await db.commit()
+        return results
+
+    def _report(self):
+        if self.stats.fills and time.monotonic() - self.stats.started >= GROUP_COMMIT_REPORT_SECONDS:
+            logger.info(json.dumps(self.stats.snapshot()))
+            self.stats.reset()
+
+    async def stop(self):
+        """Write whatever is pending and wait for batches in flight."""
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+group_committer = GroupCommitter()
@@ -0,0 +1,89 @@
+"""Idempotency-Key support for retried POSTs.
+
+The first request with a key stores its response in idempotency_keys, in
+the same transaction as the work it did. A retry with the same key and
+payload gets that response back without running the work again. Reusing
+the key with a different payload is rejected with 422. Recent keys are
+also cached in memory, so most retries cost no query at all.
+
+Keys expire after IDEMPOTENCY_KEY_TTL seconds. Purge expired rows
+periodically with:
+
+    python -m app.idempotency purge
+"""
+from fastapi import HTTPException, Response, status
+from sqlalchemy import delete
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .cache import TTLCache
+from .database import SessionLocal
+from .models import models
+import hashlib
+import json
+import os
+import sys
+
+load_dotenv()
+
+IDEMPOTENCY_KEY_TTL = float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+# (user_id, key) -> (request_hash, status_code, body)
+idempotency_cache = TTLCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_KEY_TTL)
+
+def request_hash(payload: dict) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def replay(stored, payload_hash: str) -> Response:
+    stored_hash, status_code, body = stored
+    if stored_hash != payload_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Idempotency-Key was already used with a different request"
+        )
+    return Response(body, status_code=status_code, media_type="application/json",
+                    headers={"Idempotent-Replayed": "true"})
+
+async def lookup(db, user_id: int, key: str, payload_hash: str):
+    """The stored response for this key, or None if the request has to run."""
+    stored = idempotency_cache.get((user_id, key))
+    if stored is not None:
+        return replay(stored, payload_hash)
+
+    row = await db.get(models.IdempotencyKey, (user_id, key))
+    if row is None:
+        return None
+    if row.created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL):
+        # Expired: free the key for this request, in its transaction
+        await db.delete(row)
+        await db.flush()
+        return None
+    stored = (row.request_hash, row.status_code, row.body)
+    idempotency_cache.set((user_id, key), stored)
+    return replay(stored, payload_hash)
+
+def remember(db, user_id: int, key: str, payload_hash: str, status_code: int, body: bytes):
+    """Store the response in the caller's transaction; a concurrent duplicate fails on commit."""
+    db.add(models.IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        request_hash=payload_hash,
+        status_code=status_code,
+        body=body.decode(),
+    ))
+
+def remember_committed(user_id: int, key: str, payload_hash: str, status_code: int, body: bytes):
+    idempotency_cache.set((user_id, key), (payload_hash, status_code, body))
+
+def purge() -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    with SessionLocal() as db:
+        result = db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < cutoff))
+        db.commit()
+        return result.rowcount
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["purge"]:
+        sys.exit("usage: python -m app.idempotency purge")
+    print(f"Purged {purge()} expired idempotency keys")
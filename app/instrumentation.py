@@ -0,0 +1,112 @@
+"""Per-request timing: query count, DB time, auth and serialization spans.
+
+RequestTimingMiddleware opens a RequestMetrics for every HTTP request;
+the engine hooks in app.database and the spans below add to it, and the
+totals go out as a Server-Timing header plus one structured log line.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from starlette.datastructures import MutableHeaders
+from dotenv import load_dotenv
+import json
+import logging
+import os
+import time
+
+load_dotenv()
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+
+logger = logging.getLogger("app.requests")
+
+class RequestMetrics:
+    __slots__ = ("started", "queries", "db_seconds", "spans", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.spans = {}
+        self.statements = Counter()
+
+    def record_query(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+
+    def add_span(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        parts = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"']
+        parts += [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+current_metrics: ContextVar = ContextVar("request_metrics", default=None)
+
+def record_query(statement: str, seconds: float):
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.record_query(statement, seconds)
+
+@contextmanager
+def timed(name: str):
+    """Add the wall time of the block to the current request under `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.add_span(name, time.perf_counter() - started)
+
+class RequestTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING:
+                    MutableHeaders(scope=message).append("Server-Timing", metrics.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_metrics.reset(token)
+            self._log(scope, status_code, metrics)
+
+    @staticmethod
+    def _log(scope, status_code: int, metrics: RequestMetrics):
+        line = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - metrics.started) * 1000, 2),
+            "db_queries": metrics.queries,
+            "db_ms": round(metrics.db_seconds * 1000, 2),
+        }
+        line.update({f"{name}_ms": round(seconds * 1000, 2) for name, seconds in metrics.spans.items()})
+        logger.info(json.dumps(line))
+
+        if metrics.queries > QUERY_BUDGET:
+            statement, repeats = metrics.statements.most_common(1)[0]
+            logger.warning(
+                "%s %s ran %d queries (budget %d); most repeated (%dx, possible N+1): %s",
+                scope["method"], scope["path"], metrics.queries, QUERY_BUDGET,
+                repeats, " ".join(statement.split())[:200],
+            )
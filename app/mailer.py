@@ -0,0 +1,176 @@
+"""Email outbox sender.
+
+Routers only insert EmailOutbox rows inside their own transaction; this
+worker drains them over a small pool of long-lived SMTP connections:
+
+    python -m app.mailer
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from sqlalchemy import select
+from dotenv import load_dotenv
+from .database import SessionLocal
+from .models import models
+import logging
+import os
+import queue
+import smtplib
+import time
+
+load_dotenv()
+
+SMTP_SERVER = os.getenv("SMTP_SERVER")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() in ("1", "true", "yes")
+MAIL_FROM = os.getenv("MAIL_FROM") or SMTP_USERNAME
+MAIL_POOL_SIZE = int(os.getenv("MAIL_POOL_SIZE", "2"))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "50"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "30"))
+MAIL_POLL_INTERVAL = float(os.getenv("MAIL_POLL_INTERVAL", "2"))
+
+logger = logging.getLogger(__name__)
+
+def enqueue_email(db, to_email: str, subject: str, body: str):
+    """Stage an email in the caller's transaction; nothing is sent until commit."""
+    db.add(models.EmailOutbox(to_email=to_email, subject=subject, body=body))
+
+def build_message(to_email: str, subject: str, body: str) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = MAIL_FROM
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+class SMTPConnectionPool:
+    """At most `size` authenticated SMTP connections, reused across messages."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._slots = queue.LifoQueue()
+        for _ in range(size):
+            self._slots.put(None)
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+        if SMTP_USE_TLS:
+            server.starttls()
+        if SMTP_USERNAME:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return server
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def send(self, message):
+        server = self._slots.get()
+        try:
+            if server is None:
+                server = self._connect()
+            try:
+                server.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped an idle connection; reconnect once
+                self._discard(server)
+                server = self._connect()
+                server.send_message(message)
+        except Exception:
+            if server is not None:
+                self._discard(server)
+            server = None
+            raise
+        finally:
+            self._slots.put(server)
+
+    def close(self):
+        for _ in range(self.size):
+            server = self._slots.get()
+            if server is not None:
+                self._discard(server)
+            self._slots.put(None)
+
+class OutboxSender:
+    def __init__(self, pool: SMTPConnectionPool, batch_size: int = MAIL_BATCH_SIZE,
+                 max_attempts: int = MAIL_MAX_ATTEMPTS):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._executor = ThreadPoolExecutor(max_workers=pool.size)
+
+    def _send(self, to_email, subject, body):
+        try:
+            self.pool.send(build_message(to_email, subject, body))
+        except Exception as exc:
+            return exc
+        return None
+
+    def run_once(self) -> int:
+        """Claim one batch of due messages, send them and record the outcome."""
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            rows = db.scalars(
+                select(models.EmailOutbox)
+                .where(
+                    models.EmailOutbox.status == models.EmailStatus.PENDING,
+                    models.EmailOutbox.next_attempt_at <= now,
+                )
+                .order_by(models.EmailOutbox.next_attempt_at, models.EmailOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return 0
+
+            messages = [(row.to_email, row.subject, row.body) for row in rows]
+            errors = list(self._executor.map(lambda m: self._send(*m), messages))
+
+            for row, error in zip(rows, errors):
+                row.attempts += 1
+                if error is None:
+                    row.status = models.EmailStatus.SENT
+                    row.sent_at = datetime.utcnow()
+                    row.last_error = None
+                elif row.attempts >= self.max_attempts:
+                    row.status = models.EmailStatus.FAILED
+                    row.last_error = str(error)[:500]
+                    logger.error("Giving up on email %s to %s: %s", row.id, row.to_email, error)
+                else:
+                    delay = min(MAIL_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), 3600)
+                    row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                    row.last_error = str(error)[:500]
+                    logger.warning("Email %s to %s failed, retrying in %ss: %s", row.id, row.to_email, delay, error)
+            db.commit()
+            return len(rows)
+
+    def run_forever(self, poll_interval: float = MAIL_POLL_INTERVAL):
+        while True:
+            try:
+                sent = self.run_once()
+            except Exception:
+                logger.exception("Outbox batch failed")
+                sent = 0
+            if sent < self.batch_size:
+                time.sleep(poll_interval)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sender = OutboxSender(SMTPConnectionPool(MAIL_POOL_SIZE))
+    try:
+        sender.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sender.close()
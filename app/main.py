@@ -1,111 +1,128 @@
+"""Application factory.
+
+Importing this module only assembles routes and middleware: no database
+connection, no schema build. Migrations are an explicit step (see
+app/migrations.py) and the OpenAPI schema can be prebuilt (app/openapi.py).
+"""
+import time
+
+# Taken before the framework imports so the ready log covers them
+IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.openapi.utils import get_openapi
-from .database import engine
-from .models import models
-from .routers import auth, students, managers, admin
-from .schemas import schemas
-
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Custom OpenAPI schema with security
-def custom_openapi():
-    if app.openapi_schema:
-        return app.openapi_schema
-    
-    openapi_schema = get_openapi(
-        title="Student Financial Aid System API",
-        version="1.0.0",
-        description="API for managing student financial aid applications",
-        routes=app.routes,
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+import logging
+import os
+
+from . import openapi
+from .admission import AdmissionMiddleware
+from .database import ReadYourWritesMiddleware
+from .events import broker as event_broker
+from .group_commit import group_committer
+from .instrumentation import RequestTimingMiddleware
+from .responses import FastJSONResponse
+from .revocation import revocations
+from .one_time_tokens import sweeper as token_sweeper
+from .passwords import hasher
+from .routers import auth, events, students, managers, admin
+
+load_dotenv()
+
+# Off by default so workers boot without touching the database
+STARTUP_SCHEMA_CHECK = os.getenv("STARTUP_SCHEMA_CHECK", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("app.startup")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_SCHEMA_CHECK:
+        from .migrations import check_schema
+        await run_in_threadpool(check_schema)
+    prebuilt = openapi.load_artifact(app)
+    logger.info(
+        "ready in %.1f ms since import (openapi %s)",
+        (time.perf_counter() - IMPORT_STARTED) * 1000,
+        "prebuilt" if prebuilt else "built on first use",
+    )
+    revocations.start()
+    token_sweeper.start()
+    yield
+    await group_committer.stop()
+    await token_sweeper.stop()
+    await revocations.stop()
+    hasher.shutdown()
+    await event_broker.close()
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse,
+        openapi_url=None,
+        docs_url=None,
+        redoc_url=None,
+    )
+
+    # Innermost, so shed requests still get CORS headers and are timed
+    app.add_middleware(AdmissionMiddleware)
+
+    # Read-your-writes window in a cookie, see app/database.py
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", "ETag"],
+    )
+
+    # Query count and timings per request, see app/instrumentation.py
+    app.add_middleware(RequestTimingMiddleware)
+
+    # Schema, /docs and /redoc, prebuilt when an artifact is available
+    openapi.install(app)
+
+    # Include routers
+    app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
+    # Authenticates per stream; ahead of students so /applications/{student_id} does not match
+    app.include_router(events.router, prefix="/students", tags=["Students"])
+    app.include_router(
+        students.router, 
+        prefix="/students", 
+        tags=["Students"],
+        dependencies=[Depends(auth.get_current_user)]
     )
-    
-    # Add security scheme
-    if "components" not in openapi_schema:
-        openapi_schema["components"] = {}
-        
-    openapi_schema["components"]["securitySchemes"] = {
-        "Bearer": {
-            "type": "http",
-            "scheme": "bearer",
-            "bearerFormat": "JWT",
+    app.include_router(
+        managers.router, 
+        prefix="/managers", 
+        tags=["Managers"],
+        dependencies=[Depends(auth.get_current_user)]
+    )
+    app.include_router(
+        admin.public_router,
+        prefix="/admin",
+        tags=["Admin"]
+    )
+    app.include_router(
+        admin.protected_router,
+        prefix="/admin",
+        tags=["Admin"],
+        dependencies=[Depends(auth.get_current_user)]
+    )
+
+    @app.get("/", tags=["Root"])
+    async def root():
+        return {
+            "message": "Welcome to Student Financial Aid System API",
+            "documentation": "/docs",
+            "redoc": "/redoc"
         }
-    }
-    
-    # Add schemas if they don't exist
-    if "schemas" not in openapi_schema["components"]:
-        openapi_schema["components"]["schemas"] = {}
-
-    # Add your schema definitions
-    openapi_schema["components"]["schemas"].update({
-        "Token": {
-            "title": "Token",
-            "type": "object",
-            "properties": {
-                "access_token": {"title": "Access Token", "type": "string"},
-                "token_type": {"title": "Token Type", "type": "string"}
-            },
-            "required": ["access_token", "token_type"]
-        },
-        "TokenData": {
-            "title": "TokenData",
-            "type": "object",
-            "properties": {
-                "email": {"title": "Email", "type": "string"}
-            }
-        },
-        # Add other schema definitions as needed
-    })
-    
-    # Add global security requirement
-    openapi_schema["security"] = [{"Bearer": []}]
-    
-    app.openapi_schema = openapi_schema
-    return app.openapi_schema
-
-app.openapi = custom_openapi
-
-# Include routers
-app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-app.include_router(
-    students.router, 
-    prefix="/students", 
-    tags=["Students"],
-    dependencies=[Depends(auth.get_current_user)]
-)
-app.include_router(
-    managers.router, 
-    prefix="/managers", 
-    tags=["Managers"],
-    dependencies=[Depends(auth.get_current_user)]
-)
-app.include_router(
-    admin.public_router,
-    prefix="/admin",
-    tags=["Admin"]
-)
-app.include_router(
-    admin.protected_router,
-    prefix="/admin",
-    tags=["Admin"],
-    dependencies=[Depends(auth.get_current_user)]
-)
-
-@app.get("/", tags=["Root"])
-async def root():
-    return {
-        "message": "Welcome to Student Financial Aid System API",
-        "documentation": "/docs",
-        "redoc": "/redoc"
-    }
+
+    return app
+
+app = create_app()
@@ -0,0 +1,49 @@
+"""Explicit schema step, kept out of app import and worker boot.
+
+    python -m app.migrations upgrade   # alembic upgrade head
+    python -m app.migrations check     # exit 1 unless the database is at head
+
+With STARTUP_SCHEMA_CHECK=true the API runs the same check once on
+startup and refuses to serve against an out-of-date schema.
+"""
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from .database import engine
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def alembic_config() -> Config:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    return config
+
+def upgrade():
+    command.upgrade(alembic_config(), "head")
+
+def check_schema():
+    """Raise RuntimeError unless the database is reachable and at the latest revision."""
+    heads = set(ScriptDirectory.from_config(alembic_config()).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current != heads:
+        raise RuntimeError(
+            f"Database schema is at {sorted(current) or 'no revision'}, expected {sorted(heads)}; "
+            "run `python -m app.migrations upgrade`"
+        )
+
+if __name__ == "__main__":
+    action = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if action == "upgrade":
+        upgrade()
+    elif action == "check":
+        try:
+            check_schema()
+        except RuntimeError as exc:
+            sys.exit(str(exc))
+        print("Database schema is up to date")
+    else:
+        sys.exit("usage: python -m app.migrations [upgrade|check]")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Enum, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Text, Enum, DateTime, text
 from sqlalchemy.orm import relationship
 from ..database import Base
 import enum
@@ -23,6 +23,15 @@ class DisabilityStatus(enum.Enum):
     DISABLED = "disabled"
     NOT_DISABLED = "not_disabled"
 
+class EmailStatus(enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+class TokenPurpose(enum.Enum):
+    VERIFY_EMAIL = "verify_email"
+    RESET_PASSWORD = "reset_password"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -33,13 +42,21 @@ class User(Base):
     user_type = Column(Enum(UserType))
     is_active = Column(Boolean, default=True)
     email_verified = Column(Boolean, default=False)
-    verification_token = Column(String, nullable=True)
-    verification_token_expires = Column(DateTime, nullable=True)
-    reset_token = Column(String, nullable=True)
-    reset_token_expires = Column(DateTime, nullable=True)
     
     applications = relationship("FinancialAid", back_populates="student")
 
+    __table_args__ = (
+        # Search, see app/search.py; PostgreSQL only
+        Index(
+            "ix_users_full_name_tsv", text("to_tsvector('simple', coalesce(full_name, ''))"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_users_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 class Student(User):
     __tablename__ = "students"
     id = Column(Integer, ForeignKey("users.id"), primary_key=True)
@@ -48,6 +65,22 @@ class Student(User):
     location = Column(String)
     economic_status = Column(Enum(EconomicStatus))
     disability_status = Column(Enum(DisabilityStatus))
+
+    __table_args__ = (
+        Index(
+            "ix_students_place_tsv",
+            text("to_tsvector('simple', coalesce(school, '') || ' ' || coalesce(location, ''))"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_students_school_trgm", "school",
+            postgresql_using="gin", postgresql_ops={"school": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_students_location_trgm", "location",
+            postgresql_using="gin", postgresql_ops={"location": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 class FinancialAid(Base):
     __tablename__ = "financial_aids"
 
@@ -60,4 +93,118 @@ class FinancialAid(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
-    student = relationship("User", back_populates="applications")
\ No newline at end of file
+    student = relationship("User", back_populates="applications")
+
+    __table_args__ = (
+        Index("ix_financial_aids_student_id_created_at", "student_id", "created_at"),
+        Index("ix_financial_aids_status_created_at", "status", "created_at"),
+        # Keyset pagination order of GET /managers/applications
+        Index("ix_financial_aids_created_at_id", "created_at", "id"),
+        # Incremental refresh of the review queue ranking
+        Index("ix_financial_aids_updated_at", "updated_at"),
+        Index(
+            "ix_financial_aids_purpose_tsv", text("to_tsvector('simple', coalesce(purpose, ''))"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), default=EmailStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The sender claims pending rows in due order
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+class ApplicationStat(Base):
+    """Running count and requested amount of applications per group and status."""
+    __tablename__ = "application_stats"
+
+    dimension = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    status = Column(Enum(ApplicationStatus), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Integer, default=0, nullable=False)
+
+class CacheVersion(Base):
+    """Monotonic version per cache scope, bumped in the transaction that changes the data."""
+    __tablename__ = "cache_versions"
+
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+class IdempotencyKey(Base):
+    """Stored response of a request made with an Idempotency-Key, scoped to the user."""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Expiry sweeps
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+class RevokedToken(Base):
+    """A revoked access token id, or "user:<id>" for every token issued to a user before revoked_at."""
+    __tablename__ = "revoked_tokens"
+
+    token_id = Column(String(64), primary_key=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # When the revoked tokens would have expired anyway and the row can go
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+        # Incremental refresh of the in-memory filter
+        Index("ix_revoked_tokens_revoked_at", "revoked_at"),
+    )
+
+class RefreshToken(Base):
+    """A refresh token, stored hashed; rotation retires it and issues the next one in its family."""
+    __tablename__ = "refresh_tokens"
+
+    token_hash = Column(String(64), primary_key=True)
+    family_id = Column(String(32), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime)
+    revoked_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_refresh_tokens_family_id", "family_id"),
+        Index("ix_refresh_tokens_user_id", "user_id"),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+    )
+
+class OneTimeToken(Base):
+    """An emailed verification or password reset token, stored hashed and deleted when used."""
+    __tablename__ = "one_time_tokens"
+
+    token_hash = Column(String(64), primary_key=True)
+    purpose = Column(Enum(TokenPurpose), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Replacing a user's outstanding token of the same purpose
+        Index("ix_one_time_tokens_user_id_purpose", "user_id", "purpose"),
+        # Expiry sweeps
+        Index("ix_one_time_tokens_expires_at", "expires_at"),
+    )
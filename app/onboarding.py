@@ -0,0 +1,147 @@
+from fastapi import HTTPException, status
+from datetime import timedelta
+from itertools import islice
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from .models import models
+from . import one_time_tokens
+from .passwords import hasher
+from .routers.auth import verification_email_content
+from .schemas import schemas
+import csv
+import os
+
+load_dotenv()
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+def _unreadable(line_number: int, reason: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Could not read the CSV at line {line_number}: {reason}"
+    )
+
+class _DecodedLines:
+    """The upload decoded line by line, counting lines so read errors can name theirs."""
+
+    def __init__(self, file):
+        self.lines = iter(file)
+        self.line_number = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = next(self.lines)
+        self.line_number += 1
+        try:
+            return line.decode("utf-8-sig" if self.line_number == 1 else "utf-8")
+        except UnicodeDecodeError:
+            raise _unreadable(self.line_number, "not UTF-8 text, save the file as CSV UTF-8")
+
+def _read_batches(file, batch_size: int):
+    """Yield (row_number, row) lists from a CSV file object without loading it whole."""
+    lines = _DecodedLines(file)
+    reader = csv.DictReader(lines)
+    while True:
+        batch = []
+        try:
+            for row in islice(reader, batch_size):
+                # line_num is the physical line the record ends on, quoted newlines included
+                batch.append((reader.line_num, row))
+        except csv.Error as exc:
+            raise _unreadable(lines.line_number, str(exc))
+        if not batch:
+            return
+        yield batch
+
+def _validate(row: dict) -> schemas.StudentCreate:
+    row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+    row.setdefault("user_type", models.UserType.STUDENT.value)
+    return schemas.StudentCreate(**row)
+
+async def import_students(db, file) -> dict:
+    """Create Student rows from an uploaded CSV, one batch of rows at a time.
+
+    Invalid and duplicate rows are reported and skipped; everything else is
+    written in the caller's transaction together with the verification emails.
+    """
+    created = 0
+    errors = []
+    seen_emails = set()
+    batches = _read_batches(file, IMPORT_BATCH_SIZE)
+
+    while True:
+        batch = await run_in_threadpool(next, batches, None)
+        if batch is None:
+            break
+
+        students = []
+        for row_number, row in batch:
+            try:
+                student = _validate(row)
+            except ValidationError as exc:
+                errors.append({
+                    "row": row_number,
+                    "email": row.get("email"),
+                    "errors": [f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()],
+                })
+                continue
+            if student.user_type != models.UserType.STUDENT:
+                errors.append({"row": row_number, "email": student.email, "errors": ["user_type must be student"]})
+                continue
+            if student.email in seen_emails:
+                errors.append({"row": row_number, "email": student.email, "errors": ["Duplicate email in file"]})
+                continue
+            seen_emails.add(student.email)
+            students.append((row_number, student))
+
+        if not students:
+            continue
+
+        # One set query for the whole batch instead of one lookup per row
+        existing = set((await db.scalars(
+            select(models.User.email).where(models.User.email.in_([s.email for _, s in students]))
+        )).all())
+        for row_number, student in students:
+            if student.email in existing:
+                errors.append({"row": row_number, "email": student.email, "errors": ["Email already registered"]})
+        students = [s for _, s in students if s.email not in existing]
+        if not students:
+            continue
+
+        hashed_passwords = await hasher.hash_many([s.password for s in students])
+        user_rows = []
+        for student, hashed_password in zip(students, hashed_passwords):
+            user_rows.append({
+                "email": student.email,
+                "password": hashed_password,
+                "full_name": student.full_name,
+                "user_type": models.UserType.STUDENT,
+                "is_active": False,
+                "email_verified": False,
+                "age": student.age,
+                "school": student.school,
+                "location": student.location,
+                "economic_status": student.economic_status,
+                "disability_status": student.disability_status,
+            })
+
+        # executemany; the ORM fills users first, then students with the returned ids
+        user_ids = (await db.scalars(
+            insert(models.Student).returning(models.Student.id, sort_by_parameter_order=True), user_rows
+        )).all()
+        token_rows = []
+        outbox_rows = []
+        for student, user_id in zip(students, user_ids):
+            token, token_row = one_time_tokens.token_row(user_id, models.TokenPurpose.VERIFY_EMAIL, timedelta(days=1))
+            token_rows.append(token_row)
+            subject, body = verification_email_content(token)
+            outbox_rows.append({"to_email": student.email, "subject": subject, "body": body})
+        await db.execute(insert(models.OneTimeToken), token_rows)
+        await db.execute(insert(models.EmailOutbox), outbox_rows)
+        created += len(user_rows)
+
+    return {"created": created, "errors": errors}
@@ -0,0 +1,112 @@
+"""Email verification and password reset tokens.
+
+Tokens live in one_time_tokens rather than on users: only a SHA-256 of the
+token is stored, as the primary key, so checking one is a single index
+lookup, and redeeming it deletes the row in the same statement. A
+background sweeper deletes expired rows every ONE_TIME_TOKEN_SWEEP_SECONDS,
+ONE_TIME_TOKEN_SWEEP_BATCH rows per transaction so it never holds locks
+for long.
+"""
+from sqlalchemy import delete, select
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .database import open_session
+from .models import models
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+
+load_dotenv()
+
+ONE_TIME_TOKEN_SWEEP_SECONDS = float(os.getenv("ONE_TIME_TOKEN_SWEEP_SECONDS", "300"))
+ONE_TIME_TOKEN_SWEEP_BATCH = int(os.getenv("ONE_TIME_TOKEN_SWEEP_BATCH", "1000"))
+
+logger = logging.getLogger(__name__)
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def token_row(user_id: int, purpose: models.TokenPurpose, lifetime: timedelta):
+    """A new token and the one_time_tokens row for it, for bulk inserts."""
+    token = secrets.token_urlsafe(32)
+    return token, {
+        "token_hash": hash_token(token),
+        "purpose": purpose,
+        "user_id": user_id,
+        "expires_at": datetime.utcnow() + lifetime,
+    }
+
+async def issue(db, user_id: int, purpose: models.TokenPurpose, lifetime: timedelta) -> str:
+    """Replace the user's outstanding token for `purpose` in the caller's transaction."""
+    await db.execute(delete(models.OneTimeToken).where(
+        models.OneTimeToken.user_id == user_id,
+        models.OneTimeToken.purpose == purpose,
+    ))
+    token, row = token_row(user_id, purpose, lifetime)
+    db.add(models.OneTimeToken(**row))
+    return token
+
+async def redeem(db, token: str, purpose: models.TokenPurpose):
+    """Delete a valid token and return its user id, or None; final once the caller commits."""
+    return await db.scalar(
+        delete(models.OneTimeToken)
+        .where(
+            models.OneTimeToken.token_hash == hash_token(token),
+            models.OneTimeToken.purpose == purpose,
+            models.OneTimeToken.expires_at > datetime.utcnow(),
+        )
+        .returning(models.OneTimeToken.user_id)
+    )
+
+async def sweep(batch_size: int = ONE_TIME_TOKEN_SWEEP_BATCH) -> int:
+    """Delete expired tokens, committing every `batch_size` rows."""
+    deleted = 0
+    while True:
+        async with open_session() as db:
+            expired = (
+                select(models.OneTimeToken.token_hash)
+                .where(models.OneTimeToken.expires_at < datetime.utcnow())
+                .limit(batch_size)
+            )
+            result = await db.execute(
+                delete(models.OneTimeToken)
+                .where(models.OneTimeToken.token_hash.in_(expired))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+        # Let requests in between batches
+        await asyncio.sleep(0)
+
+class Sweeper:
+    def __init__(self):
+        self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                deleted = await sweep()
+                if deleted:
+                    logger.info("Deleted %d expired one-time tokens", deleted)
+            except Exception:
+                logger.exception("Could not sweep expired one-time tokens")
+            await asyncio.sleep(ONE_TIME_TOKEN_SWEEP_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+sweeper = Sweeper()
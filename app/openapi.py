@@ -0,0 +1,149 @@
+"""OpenAPI schema, built from the routes or loaded from a prebuilt artifact.
+
+Building the schema walks every route and model, which is too slow to do
+on the first /docs hit of a fresh worker. Generate it at deploy time:
+
+    python -m app.openapi build [path]   # write the artifact
+    python -m app.openapi check [path]   # exit 1 if it no longer matches the routes
+
+Workers load the artifact on startup (OPENAPI_PATH, default openapi.json
+in the project root) and serve it with an ETag and Cache-Control. Without
+it the schema is built on first use, as before.
+"""
+from pathlib import Path
+from fastapi import Request, Response
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html
+from fastapi.openapi.utils import get_openapi
+from dotenv import load_dotenv
+from .etags import not_modified
+import hashlib
+import json
+import os
+import sys
+
+load_dotenv()
+
+ROOT = Path(__file__).resolve().parent.parent
+OPENAPI_PATH = Path(os.getenv("OPENAPI_PATH", str(ROOT / "openapi.json")))
+OPENAPI_MAX_AGE = int(os.getenv("OPENAPI_MAX_AGE", "3600"))
+
+TITLE = "Student Financial Aid System API"
+
+def build_schema(app) -> dict:
+    """The schema with the bearer security scheme applied globally."""
+    openapi_schema = get_openapi(
+        title=TITLE,
+        version="1.0.0",
+        description="API for managing student financial aid applications",
+        routes=app.routes,
+    )
+
+    # Add security scheme
+    if "components" not in openapi_schema:
+        openapi_schema["components"] = {}
+
+    openapi_schema["components"]["securitySchemes"] = {
+        "Bearer": {
+            "type": "http",
+            "scheme": "bearer",
+            "bearerFormat": "JWT",
+        }
+    }
+
+    # Add schemas if they don't exist
+    if "schemas" not in openapi_schema["components"]:
+        openapi_schema["components"]["schemas"] = {}
+
+    # Add your schema definitions
+    openapi_schema["components"]["schemas"].update({
+        "Token": {
+            "title": "Token",
+            "type": "object",
+            "properties": {
+                "access_token": {"title": "Access Token", "type": "string"},
+                "token_type": {"title": "Token Type", "type": "string"}
+            },
+            "required": ["access_token", "token_type"]
+        },
+        "TokenData": {
+            "title": "TokenData",
+            "type": "object",
+            "properties": {
+                "email": {"title": "Email", "type": "string"}
+            }
+        },
+        # Add other schema definitions as needed
+    })
+
+    # Add global security requirement
+    openapi_schema["security"] = [{"Bearer": []}]
+    return openapi_schema
+
+def encode(schema: dict) -> bytes:
+    return json.dumps(schema, separators=(",", ":")).encode("utf-8")
+
+def load_artifact(app) -> bool:
+    """Use the prebuilt schema if there is one; called on startup, never at import."""
+    if not OPENAPI_PATH.is_file():
+        return False
+    body = OPENAPI_PATH.read_bytes()
+    app.openapi_schema = json.loads(body)
+    app.state.openapi_body = body
+    return True
+
+def document(app):
+    """(body, etag) of the served schema, building it on first use without an artifact."""
+    body = getattr(app.state, "openapi_body", None)
+    if body is None:
+        body = app.state.openapi_body = encode(app.openapi())
+    return body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def install(app):
+    """Serve the schema and docs pages; the app is created with openapi_url=None."""
+
+    def openapi():
+        if app.openapi_schema is None:
+            app.openapi_schema = build_schema(app)
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+    @app.get("/openapi.json", include_in_schema=False)
+    async def openapi_json(request: Request):
+        body, etag = document(app)
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={OPENAPI_MAX_AGE}"}
+        if not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    @app.get("/docs", include_in_schema=False)
+    async def swagger_ui():
+        return get_swagger_ui_html(
+            openapi_url="/openapi.json",
+            title=TITLE + " - Swagger UI",
+            oauth2_redirect_url="/docs/oauth2-redirect",
+        )
+
+    @app.get("/docs/oauth2-redirect", include_in_schema=False)
+    async def swagger_ui_redirect():
+        return get_swagger_ui_oauth2_redirect_html()
+
+    @app.get("/redoc", include_in_schema=False)
+    async def redoc():
+        return get_redoc_html(openapi_url="/openapi.json", title=TITLE + " - ReDoc")
+
+if __name__ == "__main__":
+    from .main import create_app
+
+    action = sys.argv[1] if len(sys.argv) > 1 else "build"
+    path = Path(sys.argv[2]) if len(sys.argv) > 2 else OPENAPI_PATH
+    body = encode(build_schema(create_app()))
+    if action == "build":
+        path.write_bytes(body)
+        print(f"Wrote {path} ({len(body)} bytes)")
+    elif action == "check":
+        if not path.is_file() or path.read_bytes() != body:
+            sys.exit(f"{path} is missing or out of date; run `python -m app.openapi build`")
+        print(f"{path} is up to date")
+    else:
+        sys.exit("usage: python -m app.openapi [build|check] [path]")
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from .cache import TTLCache
+from .models import models
+import os
+
+load_dotenv()
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Immutable snapshot of the authenticated user, safe to share between requests."""
+    id: int
+    email: str
+    full_name: str
+    user_type: models.UserType
+    is_active: bool
+    email_verified: bool
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            user_type=user.user_type,
+            is_active=user.is_active,
+            email_verified=user.email_verified,
+        )
+
+# Keyed by email, the JWT subject
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(email: str):
+    """Drop the cached snapshot after any write that changes who the user is."""
+    principal_cache.pop(email)
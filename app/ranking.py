@@ -0,0 +1,226 @@
+"""Needs-based ranking of pending applications.
+
+The engine keeps every pending application in columnar NumPy arrays: one
+feature row per application and its score, the dot product of that row
+with the configured weights. The first request loads the arrays with one
+query. After that, each refresh fetches only the applications whose
+updated_at moved, re-scores those rows and drops the ones that are no
+longer pending. A full reload runs every RANK_FULL_RELOAD_SECONDS to pick
+up anything the incremental path cannot see, such as edited student
+profiles.
+
+Features, each roughly in [0, 1] before weighting:
+
+  economic    poor 1, medium 0.5, rich 0 (unknown 0.5)
+  disability  1 for disabled students
+  age         1 at 16 falling to 0 at 30 and above
+  location    1 if in RANK_PRIORITY_LOCATIONS
+  school      1 if in RANK_PRIORITY_SCHOOLS
+  amount      requested amount / RANK_AMOUNT_SCALE
+  waiting     months since the application was made
+
+The waiting feature is stored as minus the creation time, so scores
+never go stale. The current time only adds the same offset to every
+application, and that offset is applied when a page is served.
+"""
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .models import models
+import asyncio
+import numpy as np
+import os
+import time
+
+load_dotenv()
+
+FEATURES = ("economic", "disability", "age", "location", "school", "amount", "waiting")
+DEFAULT_WEIGHTS = {
+    "economic": 3.0,
+    "disability": 2.0,
+    "age": 0.5,
+    "location": 1.0,
+    "school": 0.5,
+    "amount": -0.5,
+    "waiting": 1.0,
+}
+RANK_WEIGHTS = np.array(
+    [float(os.getenv(f"RANK_WEIGHT_{name.upper()}", str(DEFAULT_WEIGHTS[name]))) for name in FEATURES]
+)
+RANK_PRIORITY_LOCATIONS = {v.strip() for v in os.getenv("RANK_PRIORITY_LOCATIONS", "").split(",") if v.strip()}
+RANK_PRIORITY_SCHOOLS = {v.strip() for v in os.getenv("RANK_PRIORITY_SCHOOLS", "").split(",") if v.strip()}
+RANK_AMOUNT_SCALE = float(os.getenv("RANK_AMOUNT_SCALE", "5000"))
+RANK_REFRESH_SECONDS = float(os.getenv("RANK_REFRESH_SECONDS", "1"))
+RANK_FULL_RELOAD_SECONDS = float(os.getenv("RANK_FULL_RELOAD_SECONDS", "3600"))
+# Re-read rows this far behind the newest updated_at seen, for transactions that commit late
+RANK_REFRESH_OVERLAP_SECONDS = float(os.getenv("RANK_REFRESH_OVERLAP_SECONDS", "5"))
+
+SECONDS_PER_MONTH = 30 * 86400
+ECONOMIC_SCORES = {
+    models.EconomicStatus.POOR: 1.0,
+    models.EconomicStatus.MEDIUM: 0.5,
+    models.EconomicStatus.RICH: 0.0,
+}
+WAITING = FEATURES.index("waiting")
+EPOCH = datetime(1970, 1, 1)
+
+def ranking_query():
+    aids = models.FinancialAid.__table__
+    students = models.Student.__table__
+    return select(
+        aids.c.id, aids.c.status, aids.c.amount, aids.c.created_at, aids.c.updated_at,
+        students.c.economic_status, students.c.disability_status, students.c.age,
+        students.c.school, students.c.location,
+    ).select_from(aids.outerjoin(students, students.c.id == aids.c.student_id))
+
+def _timestamps(values) -> np.ndarray:
+    """Seconds since the epoch of naive datetimes, in the same clock they were written with."""
+    return np.fromiter(((value - EPOCH).total_seconds() for value in values), dtype=float, count=len(values))
+
+def build_features(rows) -> tuple:
+    """(ids, feature matrix) for rows of ranking_query(), one column per FEATURES entry."""
+    # One list per column; zip(*rows) is far slower on large results
+    ids, _, amount, created_at, updated_at, economic, disability, age, school, location = (
+        [row[i] for row in rows] for i in range(10)
+    )
+    # created_at is nullable; rows written outside the app may lack it
+    if None in created_at:
+        now = datetime.now()
+        created_at = [c or u or now for c, u in zip(created_at, updated_at)]
+    features = np.empty((len(rows), len(FEATURES)))
+    features[:, 0] = [ECONOMIC_SCORES.get(value, 0.5) for value in economic]
+    features[:, 1] = [value == models.DisabilityStatus.DISABLED for value in disability]
+    features[:, 2] = np.nan_to_num(np.clip((30 - np.array(age, dtype=float)) / 14, 0, 1))
+    features[:, 3] = [value in RANK_PRIORITY_LOCATIONS for value in location]
+    features[:, 4] = [value in RANK_PRIORITY_SCHOOLS for value in school]
+    features[:, 5] = np.nan_to_num(np.array(amount, dtype=float)) / RANK_AMOUNT_SCALE
+    features[:, WAITING] = -_timestamps(created_at) / SECONDS_PER_MONTH
+    return np.array(ids, dtype=np.int64), features
+
+class RankingEngine:
+    """Columnar store of pending applications ordered by (score desc, id asc)."""
+
+    def __init__(self, weights=RANK_WEIGHTS):
+        self.weights = np.asarray(weights, dtype=float)
+        self.size = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.features = np.empty((0, len(FEATURES)))
+        self.scores = np.empty(0)
+        self.positions = {}
+        self.watermark = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self._lock = None
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self.ids):
+            return
+        capacity = max(needed, 2 * len(self.ids), 1024)
+        self.ids = np.resize(self.ids, capacity)
+        self.scores = np.resize(self.scores, capacity)
+        features = np.empty((capacity, len(FEATURES)))
+        features[:self.size] = self.features[:self.size]
+        self.features = features
+
+    def replace(self, ids: np.ndarray, features: np.ndarray):
+        """Drop everything and rank exactly these applications."""
+        self.size = 0
+        self._reserve(len(ids))
+        self.ids[:len(ids)] = ids
+        self.features[:len(ids)] = features
+        self.scores[:len(ids)] = features @ self.weights
+        self.positions = dict(zip(ids.tolist(), range(len(ids))))
+        self.size = len(ids)
+
+    def upsert(self, ids: np.ndarray, features: np.ndarray):
+        """Insert or re-score applications; only these rows are touched."""
+        self._reserve(len(ids))
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, application_id in enumerate(ids.tolist()):
+            row = self.positions.get(application_id)
+            if row is None:
+                row = self.positions[application_id] = self.size
+                self.size += 1
+            rows[i] = row
+        self.ids[rows] = ids
+        self.features[rows] = features
+        self.scores[rows] = features @ self.weights
+
+    def remove(self, ids):
+        """Drop applications by moving the last row into each freed slot."""
+        for application_id in ids:
+            row = self.positions.pop(application_id, None)
+            if row is None:
+                continue
+            last = self.size - 1
+            if row != last:
+                moved = int(self.ids[last])
+                self.ids[row] = self.ids[last]
+                self.features[row] = self.features[last]
+                self.scores[row] = self.scores[last]
+                self.positions[moved] = row
+            self.size = last
+
+    def score_offset(self, now: datetime = None) -> float:
+        """What the waiting feature adds to every score at `now`."""
+        now = _timestamps([now or datetime.now()])[0]
+        return float(self.weights[WAITING] * now / SECONDS_PER_MONTH)
+
+    def page(self, limit: int, after=None) -> list:
+        """The next `limit` + 1 (id, stored score) pairs after the (score, id) key `after`."""
+        scores = self.scores[:self.size]
+        ids = self.ids[:self.size]
+        if after is not None:
+            last_score, last_id = after
+            candidates = np.flatnonzero((scores < last_score) | ((scores == last_score) & (ids > last_id)))
+        else:
+            candidates = np.arange(self.size)
+        wanted = limit + 1
+        if len(candidates) > wanted:
+            # Partial selection, keeping every tie of the cut-off score so ids order them
+            cutoff = np.partition(scores[candidates], len(candidates) - wanted)[len(candidates) - wanted]
+            candidates = candidates[scores[candidates] >= cutoff]
+        order = np.lexsort((ids[candidates], -scores[candidates]))[:wanted]
+        chosen = candidates[order]
+        return list(zip(ids[chosen].tolist(), scores[chosen].tolist()))
+
+    async def refresh(self, db):
+        """Bring the arrays up to date: a full load when due, otherwise only changed rows."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            if self.loaded_at is None or now - self.loaded_at >= RANK_FULL_RELOAD_SECONDS:
+                await self._full_load(db)
+                self.loaded_at = self.refreshed_at = now
+            elif now - self.refreshed_at >= RANK_REFRESH_SECONDS:
+                await self._load_changes(db)
+                self.refreshed_at = now
+
+    async def _full_load(self, db):
+        aids = models.FinancialAid.__table__
+        watermark = await db.scalar(select(func.max(aids.c.updated_at)))
+        rows = (await db.execute(
+            ranking_query().where(aids.c.status == models.ApplicationStatus.PENDING)
+        )).all()
+        ids, features = await run_in_threadpool(build_features, rows)
+        self.replace(ids, features)
+        self.watermark = watermark
+
+    async def _load_changes(self, db):
+        if self.watermark is None:
+            await self._full_load(db)
+            return
+        aids = models.FinancialAid.__table__
+        since = self.watermark - timedelta(seconds=RANK_REFRESH_OVERLAP_SECONDS)
+        rows = (await db.execute(ranking_query().where(aids.c.updated_at >= since))).all()
+        if not rows:
+            return
+        pending = [row for row in rows if row.status == models.ApplicationStatus.PENDING]
+        self.remove(row.id for row in rows if row.status != models.ApplicationStatus.PENDING)
+        self.upsert(*build_features(pending))
+        self.watermark = max(self.watermark, max(row.updated_at for row in rows))
+
+ranking_engine = RankingEngine()
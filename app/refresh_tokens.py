@@ -0,0 +1,129 @@
+"""Rotating refresh tokens.
+
+Login hands out a refresh token next to the short-lived access token.
+Exchanging it at /auth/refresh returns a new pair without checking the
+password again, so renewing an access token costs no bcrypt.
+
+A token is a random value followed by its HMAC under SECRET_KEY, so a
+forged or mangled token is rejected before touching the database. Only a
+SHA-256 of the token is stored. Every exchange retires the token and
+issues its successor in the same family. If a retired token is presented
+again, someone holds a copy, and the whole family is revoked.
+
+Purge expired rows periodically with:
+
+    python -m app.refresh_tokens purge
+"""
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .database import SessionLocal
+from .models import models
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+def _signature(value: str) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), value.encode(), hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def verify(token: str) -> bool:
+    value, _, signature = token.rpartition(".")
+    return bool(value) and hmac.compare_digest(signature, _signature(value))
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def invalid_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def issue(db, user_id: int, family_id: str = None) -> str:
+    """Add a new refresh token to the caller's transaction and return it."""
+    value = secrets.token_urlsafe(32)
+    token = f"{value}.{_signature(value)}"
+    db.add(models.RefreshToken(
+        token_hash=hash_token(token),
+        family_id=family_id or secrets.token_urlsafe(16),
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+async def rotate(db, token: str):
+    """Retire `token` and issue its successor; returns (user_id, new token).
+
+    The successor is only valid once the caller commits.
+    """
+    if not verify(token):
+        raise invalid_token()
+    token_hash = hash_token(token)
+    now = datetime.utcnow()
+    # Conditional, so of two concurrent exchanges of one token only one wins
+    retired = (await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == token_hash,
+            models.RefreshToken.used_at.is_(None),
+            models.RefreshToken.revoked_at.is_(None),
+            models.RefreshToken.expires_at > now,
+        )
+        .values(used_at=now)
+        .returning(models.RefreshToken.user_id, models.RefreshToken.family_id)
+    )).first()
+    if retired is None:
+        reused = await db.get(models.RefreshToken, token_hash)
+        if reused is not None and reused.used_at is not None and reused.revoked_at is None:
+            await revoke_family(db, reused.family_id)
+            await db.commit()
+        raise invalid_token()
+    user_id, family_id = retired
+    return user_id, issue(db, user_id, family_id)
+
+async def revoke_family(db, family_id: str):
+    await db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.family_id == family_id, models.RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+
+async def revoke(db, token: str):
+    """Revoke the family of `token`, if it is one of ours."""
+    if not verify(token):
+        return
+    family = (
+        select(models.RefreshToken.family_id)
+        .where(models.RefreshToken.token_hash == hash_token(token))
+        .scalar_subquery()
+    )
+    await revoke_family(db, family)
+
+async def revoke_user(db, user_id: int):
+    await db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.user_id == user_id, models.RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+
+def purge() -> int:
+    with SessionLocal() as db:
+        result = db.execute(delete(models.RefreshToken).where(models.RefreshToken.expires_at < datetime.utcnow()))
+        db.commit()
+        return result.rowcount
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["purge"]:
+        sys.exit("usage: python -m app.refresh_tokens purge")
+    print(f"Purged {purge()} expired refresh tokens")
@@ -0,0 +1,42 @@
+"""JSON encoding for responses.
+
+orjson is optional; without it everything falls back to the stdlib
+encoder. FAST_RESPONSES=true lets list endpoints skip re-validating rows
+they built themselves from typed columns and encode them directly.
+"""
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from dotenv import load_dotenv
+from .instrumentation import timed
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+load_dotenv()
+
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+def dumps(content) -> bytes:
+    """Encode JSON-ready content; orjson handles datetime and Enum natively."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return dumps(content)
+
+def schema_columns(schema, entity) -> list:
+    """The mapped columns of `entity` backing each field of `schema`, in field order."""
+    return [getattr(entity, name) for name in schema.model_fields]
+
+def rows_to_dicts(rows, schema) -> list:
+    names = list(schema.model_fields)
+    return [dict(zip(names, row)) for row in rows]
@@ -0,0 +1,162 @@
+"""Access token revocation.
+
+Revoked token ids live in revoked_tokens until the token would have
+expired anyway. A row is either one token's jti (logout) or "user:<id>",
+which revokes every token that user was issued before revoked_at
+(password change or reset, deactivation).
+
+Every worker mirrors the table into a Bloom filter, so get_current_user
+only queries the table when the filter reports a possible hit. A
+background task adds new rows every REVOCATION_REFRESH_SECONDS. Every
+REVOCATION_REBUILD_SECONDS it purges expired rows and rebuilds the
+filter, which is how entries ever leave it. Revocations made by this
+worker are added to its own filter at once; other workers see them
+within one refresh. Until the first load the table is always consulted.
+"""
+from sqlalchemy import delete, select
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from calendar import timegm
+from .database import dialect_insert, open_session
+from .models import models
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+
+load_dotenv()
+
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "10"))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "3600"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+# Rows can commit slightly out of revoked_at order; re-read this far back on refresh
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+logger = logging.getLogger(__name__)
+
+def timestamp(moment: datetime) -> float:
+    """Seconds since the epoch of a naive UTC datetime, keeping microseconds.
+
+    Tokens carry a fractional iat so one issued right after a user-wide
+    revocation is not mistaken for one issued in the same second before it.
+    """
+    return timegm(moment.utctimetuple()) + moment.microsecond / 1e6
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using double hashing of one blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class RevocationList:
+    def __init__(self):
+        self.bloom = BloomFilter(REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE)
+        self.loaded = False
+        self.watermark = None
+        self.rebuilt_at = None
+        self._task = None
+
+    async def is_revoked(self, db, claims: dict, user_id: int) -> bool:
+        jti = claims.get("jti")
+        keys = [user_key(user_id)] + ([jti] if jti else [])
+        if self.loaded and not any(key in self.bloom for key in keys):
+            return False
+        rows = await db.execute(
+            select(models.RevokedToken.token_id, models.RevokedToken.revoked_at)
+            .where(models.RevokedToken.token_id.in_(keys))
+        )
+        issued_at = claims.get("iat", 0)
+        for token_id, revoked_at in rows.all():
+            if token_id == jti or issued_at < timestamp(revoked_at):
+                return True
+        return False
+
+    async def _store(self, db, token_id: str, expires_at: datetime):
+        statement = dialect_insert(models.RevokedToken)
+        statement = statement.on_conflict_do_update(
+            index_elements=["token_id"],
+            set_={"revoked_at": statement.excluded.revoked_at, "expires_at": statement.excluded.expires_at},
+        )
+        await db.execute(statement, [{"token_id": token_id, "revoked_at": datetime.utcnow(), "expires_at": expires_at}])
+        self.bloom.add(token_id)
+
+    async def revoke_token(self, db, jti: str, expires_at: datetime):
+        """Revoke one token; takes effect when the caller commits."""
+        await self._store(db, jti, expires_at)
+
+    async def revoke_user(self, db, user_id: int, token_lifetime: timedelta):
+        """Revoke every token issued to the user until now."""
+        await self._store(db, user_key(user_id), datetime.utcnow() + token_lifetime)
+
+    async def refresh(self):
+        async with open_session() as db:
+            query = select(models.RevokedToken.token_id, models.RevokedToken.revoked_at)
+            if self.watermark is not None:
+                query = query.where(models.RevokedToken.revoked_at >= self.watermark - REFRESH_OVERLAP)
+            rows = (await db.execute(query)).all()
+        for token_id, revoked_at in rows:
+            self.bloom.add(token_id)
+            self.watermark = max(self.watermark or revoked_at, revoked_at)
+        self.loaded = True
+
+    async def rebuild(self):
+        """Purge expired rows and start a fresh filter from the remaining ones."""
+        async with open_session() as db:
+            await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at < datetime.utcnow()))
+            await db.commit()
+            rows = (await db.execute(select(models.RevokedToken.token_id, models.RevokedToken.revoked_at))).all()
+        bloom = BloomFilter(max(REVOCATION_BLOOM_CAPACITY, 2 * len(rows)), REVOCATION_BLOOM_ERROR_RATE)
+        for token_id, _ in rows:
+            bloom.add(token_id)
+        self.bloom = bloom
+        self.watermark = max((revoked_at for _, revoked_at in rows), default=None)
+        self.rebuilt_at = time.monotonic()
+        self.loaded = True
+
+    async def run(self):
+        while True:
+            try:
+                if self.rebuilt_at is None or time.monotonic() - self.rebuilt_at >= REVOCATION_REBUILD_SECONDS:
+                    await self.rebuild()
+                else:
+                    await self.refresh()
+            except Exception:
+                logger.exception("Could not refresh the token revocation list")
+            await asyncio.sleep(REVOCATION_REFRESH_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+revocations = RevocationList()
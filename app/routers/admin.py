@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..database import get_db
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db, get_read_db
+from ..onboarding import import_students
+from ..etags import USERS, bump_versions, conditional_get, etag_response
+from ..pagination import page_limit, encode_cursor, decode_cursor
+from ..responses import rows_to_dicts, schema_columns
 from ..models import models
 from ..schemas import schemas
-from ..routers.auth import get_current_user, get_password_hash
-from typing import List
+from ..principals import Principal, invalidate_principal
+from ..routers.auth import get_current_user, get_password_hash, revoke_user_tokens
+from typing import Optional
 
 # Create two separate routers
 public_router = APIRouter()
@@ -17,12 +23,12 @@ protected_router = APIRouter()
 )
 async def create_initial_admin(
     admin: schemas.UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if any admin exists
-    existing_admin = db.query(models.User).filter(
+    existing_admin = await db.scalar(select(models.User).where(
         models.User.user_type == models.UserType.ADMIN
-    ).first()
+    ))
     
     if existing_admin:
         raise HTTPException(
@@ -37,7 +43,7 @@ async def create_initial_admin(
         )
     
     # Check if email exists
-    if db.query(models.User).filter(models.User.email == admin.email).first():
+    if await db.scalar(select(models.User).where(models.User.email == admin.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -46,7 +52,7 @@ async def create_initial_admin(
     # Create admin user
     db_admin = models.User(
         email=admin.email,
-        password=get_password_hash(admin.password),
+        password=await get_password_hash(admin.password),
         full_name=admin.full_name,
         user_type=models.UserType.ADMIN,
         is_active=True,
@@ -54,8 +60,8 @@ async def create_initial_admin(
     )
     
     db.add(db_admin)
-    db.commit()
-    db.refresh(db_admin)
+    await db.commit()
+    await db.refresh(db_admin)
     
     return db_admin
 
@@ -67,8 +73,8 @@ async def create_initial_admin(
 )
 async def create_admin(
     admin: schemas.UserCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify current user is admin
     if current_user.user_type != models.UserType.ADMIN:
@@ -85,7 +91,7 @@ async def create_admin(
         )
     
     # Check if email exists
-    if db.query(models.User).filter(models.User.email == admin.email).first():
+    if await db.scalar(select(models.User).where(models.User.email == admin.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -94,7 +100,7 @@ async def create_admin(
     # Create admin user
     db_admin = models.User(
         email=admin.email,
-        password=get_password_hash(admin.password),
+        password=await get_password_hash(admin.password),
         full_name=admin.full_name,
         user_type=models.UserType.ADMIN,
         is_active=True,
@@ -102,15 +108,18 @@ async def create_admin(
     )
     
     db.add(db_admin)
-    db.commit()
-    db.refresh(db_admin)
+    await db.commit()
+    await db.refresh(db_admin)
     
     return db_admin
 
-@protected_router.get("/managers", response_model=List[schemas.User])
+@protected_router.get("/managers", response_model=schemas.UserPage)
 async def get_all_managers(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.user_type != models.UserType.ADMIN:
         raise HTTPException(
@@ -118,16 +127,26 @@ async def get_all_managers(
             detail="Only admins can view managers"
         )
     
-    managers = db.query(models.User)\
-        .filter(models.User.user_type == models.UserType.MANAGER)\
-        .all()
-    return managers
+    etag, response = await conditional_get(db, request, USERS)
+    if response is not None:
+        return response
+
+    query = select(*schema_columns(schemas.User, models.User)).where(models.User.user_type == models.UserType.MANAGER)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(models.User.id > last_id)
+    managers = rows_to_dicts((await db.execute(query.order_by(models.User.id).limit(limit + 1))).all(), schemas.User)
+    next_cursor = None
+    if len(managers) > limit:
+        managers = managers[:limit]
+        next_cursor = encode_cursor(managers[-1]["id"])
+    return etag_response(etag, schemas.UserPage, {"items": managers, "next_cursor": next_cursor})
 
 @protected_router.put("/managers/{manager_id}/deactivate")
 async def deactivate_manager(
     manager_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.user_type != models.UserType.ADMIN:
         raise HTTPException(
@@ -135,9 +154,9 @@ async def deactivate_manager(
             detail="Only admins can deactivate managers"
         )
     
-    manager = db.query(models.User)\
-        .filter(models.User.id == manager_id, models.User.user_type == models.UserType.MANAGER)\
-        .first()
+    manager = await db.scalar(select(models.User)
+        .where(models.User.id == manager_id, models.User.user_type == models.UserType.MANAGER)
+    )
     
     if not manager:
         raise HTTPException(
@@ -146,13 +165,19 @@ async def deactivate_manager(
         )
     
     manager.is_active = False
-    db.commit()
+    await bump_versions(db, USERS)
+    await revoke_user_tokens(db, manager.id)
+    await db.commit()
+    invalidate_principal(manager.email)
     return {"message": "Manager deactivated successfully"}
 
-@protected_router.get("/students", response_model=List[schemas.User])
+@protected_router.get("/students", response_model=schemas.UserPage)
 async def get_all_students(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.user_type != models.UserType.ADMIN:
         raise HTTPException(
@@ -160,7 +185,40 @@ async def get_all_students(
             detail="Only admins can view all students"
         )
     
-    students = db.query(models.User)\
-        .filter(models.User.user_type == models.UserType.STUDENT)\
-        .all()
-    return students
+    etag, response = await conditional_get(db, request, USERS)
+    if response is not None:
+        return response
+
+    query = select(*schema_columns(schemas.User, models.User)).where(models.User.user_type == models.UserType.STUDENT)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(models.User.id > last_id)
+    students = rows_to_dicts((await db.execute(query.order_by(models.User.id).limit(limit + 1))).all(), schemas.User)
+    next_cursor = None
+    if len(students) > limit:
+        students = students[:limit]
+        next_cursor = encode_cursor(students[-1]["id"])
+    return etag_response(etag, schemas.UserPage, {"items": students, "next_cursor": next_cursor})
+
+@protected_router.post("/students/import",
+    response_model=schemas.StudentImportResult,
+    summary="Bulk onboard students from a CSV upload (requires admin privileges)"
+)
+async def import_students_csv(
+    file: UploadFile = File(...,
+        description="CSV with email, password, full_name, age, school, location, economic_status, disability_status"
+    ),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.user_type != models.UserType.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can import students"
+        )
+    
+    result = await import_students(db, file.file)
+    if result["created"]:
+        await bump_versions(db, USERS)
+    await db.commit()
+    return result
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from typing import Optional
 import secrets
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from ..database import get_db
+from ..database import current_user_id, get_db
+from ..mailer import enqueue_email
+from ..etags import USERS, bump_versions
+from ..instrumentation import timed
+from ..passwords import pwd_context, hasher
+from ..principals import Principal, principal_cache, invalidate_principal
+from ..revocation import revocations, timestamp
+from .. import one_time_tokens, refresh_tokens
 from ..models import models
 from ..schemas import schemas
 import os
@@ -20,47 +24,47 @@ load_dotenv()
 router = APIRouter()
 
 # Constants and configurations
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT"))
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 
 # Initialize the security scheme
 security = HTTPBearer()
 
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
+    issued = datetime.utcnow()
+    expire = issued + (expires_delta or timedelta(minutes=15))
+    # jti identifies the token for logout, iat orders it against user-wide revocations
+    to_encode.update({"exp": expire, "iat": timestamp(issued), "jti": secrets.token_urlsafe(16)})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# Email functions
-def send_email(to_email: str, subject: str, body: str):
-    msg = MIMEMultipart()
-    msg['From'] = SMTP_USERNAME
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'html'))
-
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.send_message(msg)
-
-def send_verification_email(email: str, token: str, background_tasks: BackgroundTasks):
-    """Send verification email"""
+def token_response(email: str, refresh_token: str):
+    access_token = create_access_token(
+        data={"sub": email}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token
+    }
+
+async def revoke_user_tokens(db, user_id: int):
+    """Revoke every access and refresh token issued to the user so far, on the caller's commit"""
+    await revocations.revoke_user(db, user_id, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    await refresh_tokens.revoke_user(db, user_id)
+
+# Email functions, delivered from the outbox by app.mailer
+def verification_email_content(token: str):
+    """Subject and body of the verification email"""
     verification_url = f"{API_BASE_URL}/auth/verify-email/{token}"
     subject = "Verify your email address"
     body = f"""
@@ -69,10 +73,15 @@ def send_verification_email(email: str, token: str, background_tasks: Background
     <p><a href="{verification_url}">Verify Email</a></p>
     <p>This link will expire in 24 hours.</p>
     """
-    background_tasks.add_task(send_email, email, subject, body)
+    return subject, body
 
-def send_password_reset_email(email: str, token: str, background_tasks: BackgroundTasks):
-    """Send password reset email"""
+def send_verification_email(db: AsyncSession, email: str, token: str):
+    """Queue verification email in the caller's transaction"""
+    subject, body = verification_email_content(token)
+    enqueue_email(db, email, subject, body)
+
+def send_password_reset_email(db: AsyncSession, email: str, token: str):
+    """Queue password reset email in the caller's transaction"""
     reset_url = f"{API_BASE_URL}/auth/reset-password/{token}"
     subject = "Reset your password"
     body = f"""
@@ -81,13 +90,10 @@ def send_password_reset_email(email: str, token: str, background_tasks: Backgrou
     <p><a href="{reset_url}">Reset Password</a></p>
     <p>This link will expire in 1 hour.</p>
     """
-    background_tasks.add_task(send_email, email, subject, body)
+    enqueue_email(db, email, subject, body)
 
 # Define get_current_user before using it in routes
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db)
-):
+async def principal_from_token(token: str, db) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -95,118 +101,142 @@ async def get_current_user(
     )
 
     try:
-        token = credentials.credentials  # Get the token from credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = await db.scalar(select(models.User).where(models.User.email == email))
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.set(email, principal)
+    # Only queries the table when the Bloom filter reports a possible match
+    if await revocations.is_revoked(db, payload, principal.id):
         raise credentials_exception
-    return user
+    # Commits in this request start the user's read-your-writes window
+    current_user_id.set(principal.id)
+    return principal
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: AsyncSession = Depends(get_db)
+):
+    with timed("auth"):
+        return await principal_from_token(credentials.credentials, db)
 
 # Now define all the route handlers
 @router.post("/login", response_model=schemas.Token)
 async def login(
     credentials: schemas.LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(models.User).filter(models.User.email == credentials.email).first()
-    if not user or not verify_password(credentials.password, user.password):
+    user = await db.scalar(select(models.User).where(models.User.email == credentials.email))
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await hasher.verify_and_update(credentials.password, user.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    # Transparently upgrade hashes made with outdated cost parameters
+    if new_hash:
+        user.password = new_hash
+    refresh_token = refresh_tokens.issue(db, user.id)
+    await db.commit()
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer"
-    }
+    return token_response(user.email, refresh_token)
+
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh(
+    request: schemas.RefreshRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Exchange a refresh token for new tokens, without the password"""
+    user_id, refresh_token = await refresh_tokens.rotate(db, request.refresh_token)
+    user = await db.get(models.User, user_id)
+    await db.commit()
+    
+    return token_response(user.email, refresh_token)
 
 @router.post("/register", response_model=schemas.UserResponse)
 async def register(
     user: schemas.UserCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Register a new user"""
     # Check if email exists
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if await db.scalar(select(models.User).where(models.User.email == user.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Create user
-    hashed_password = pwd_context.hash(user.password)
-    verification_token = secrets.token_urlsafe(32)
+    hashed_password = await get_password_hash(user.password)
     
     db_user = models.User(
         email=user.email,
         password=hashed_password,
         full_name=user.full_name,
         user_type=user.user_type,
-        is_active=False,  # Will be activated after email verification
-        verification_token=verification_token,
-        verification_token_expires=datetime.utcnow() + timedelta(days=1)
+        is_active=False  # Will be activated after email verification
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    # Send verification email
-    send_verification_email(user.email, verification_token, background_tasks)
+    await db.flush()
+    verification_token = await one_time_tokens.issue(
+        db, db_user.id, models.TokenPurpose.VERIFY_EMAIL, timedelta(days=1)
+    )
+    # Queued in the same transaction so the email survives a restart
+    send_verification_email(db, user.email, verification_token)
+    await bump_versions(db, USERS)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.get("/verify-email/{token}", response_model=schemas.MessageResponse)
-async def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
     """Verify email address"""
-    user = db.query(models.User).filter(
-        models.User.verification_token == token,
-        models.User.verification_token_expires > datetime.utcnow()
-    ).first()
+    user_id = await one_time_tokens.redeem(db, token, models.TokenPurpose.VERIFY_EMAIL)
     
-    if not user:
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired verification token"
         )
     
+    user = await db.get(models.User, user_id)
     user.is_active = True
     user.email_verified = True
-    user.verification_token = None
-    user.verification_token_expires = None
+    await bump_versions(db, USERS)
     
-    db.commit()
+    await db.commit()
+    invalidate_principal(user.email)
     
     return {"message": "Email verified successfully"}
 
 @router.post("/forgot-password", response_model=schemas.MessageResponse)
 async def forgot_password(
     email_request: schemas.EmailRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Request password reset"""
-    user = db.query(models.User).filter(models.User.email == email_request.email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email_request.email))
     if user:
-        reset_token = secrets.token_urlsafe(32)
-        user.reset_token = reset_token
-        user.reset_token_expires = datetime.utcnow() + timedelta(hours=1)
-        db.commit()
-        
-        send_password_reset_email(user.email, reset_token, background_tasks)
+        reset_token = await one_time_tokens.issue(
+            db, user.id, models.TokenPurpose.RESET_PASSWORD, timedelta(hours=1)
+        )
+        send_password_reset_email(db, user.email, reset_token)
+        await db.commit()
     
     return {"message": "If the email exists, a password reset link has been sent"}
 
@@ -214,42 +244,63 @@ async def forgot_password(
 async def reset_password(
     token: str,
     new_password: schemas.PasswordReset,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Reset password using token"""
-    user = db.query(models.User).filter(
-        models.User.reset_token == token,
-        models.User.reset_token_expires > datetime.utcnow()
-    ).first()
+    user_id = await one_time_tokens.redeem(db, token, models.TokenPurpose.RESET_PASSWORD)
     
-    if not user:
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired reset token"
         )
     
-    user.password = pwd_context.hash(new_password.password)
-    user.reset_token = None
-    user.reset_token_expires = None
+    user = await db.get(models.User, user_id)
+    user.password = await get_password_hash(new_password.password)
+    await revoke_user_tokens(db, user.id)
     
-    db.commit()
+    await db.commit()
+    invalidate_principal(user.email)
     
     return {"message": "Password reset successfully"}
 
 @router.post("/change-password", response_model=schemas.MessageResponse)
 async def change_password(
     passwords: schemas.PasswordChange,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Change password for authenticated user"""
-    if not pwd_context.verify(passwords.current_password, current_user.password):
+    user = await db.get(models.User, current_user.id)
+    if not await verify_password(passwords.current_password, user.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
         )
     
-    current_user.password = pwd_context.hash(passwords.new_password)
-    db.commit()
+    user.password = await get_password_hash(passwords.new_password)
+    await revoke_user_tokens(db, user.id)
+    await db.commit()
+    invalidate_principal(user.email)
     
     return {"message": "Password changed successfully"}
+
+@router.post("/logout", response_model=schemas.MessageResponse)
+async def logout(
+    request: Optional[schemas.RefreshRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: AsyncSession = Depends(get_db)
+):
+    """Revoke the access token used for this request, and the refresh token if given"""
+    principal = await principal_from_token(credentials.credentials, db)
+    claims = jwt.get_unverified_claims(credentials.credentials)
+    if claims.get("jti"):
+        await revocations.revoke_token(db, claims["jti"], datetime.utcfromtimestamp(claims["exp"]))
+    else:
+        # Issued before tokens carried an id
+        await revoke_user_tokens(db, principal.id)
+    if request is not None:
+        await refresh_tokens.revoke(db, request.refresh_token)
+    await db.commit()
+    
+    return {"message": "Logged out successfully"}
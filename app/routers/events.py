@@ -0,0 +1,91 @@
+from fastapi import APIRouter, HTTPException, Request, WebSocket, status
+from fastapi.responses import StreamingResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from dotenv import load_dotenv
+from typing import Optional
+from ..database import open_session
+from ..events import broker, student_channel
+from ..models import models
+from ..principals import Principal
+from ..routers.auth import principal_from_token
+import asyncio
+import json
+import os
+
+load_dotenv()
+
+# Comment lines keep idle streams open through proxies
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+
+router = APIRouter()
+
+async def stream_principal(authorization: Optional[str], token: Optional[str]) -> Principal:
+    """Authenticate a stream from the bearer header, or from ?token= for browser
+    EventSource and WebSocket clients, which cannot set headers."""
+    scheme, credentials = get_authorization_scheme_param(authorization)
+    if scheme.lower() != "bearer":
+        credentials = token
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # A short session of its own, so no connection is held while streaming
+    async with open_session() as db:
+        principal = await principal_from_token(credentials, db)
+    if principal.user_type != models.UserType.STUDENT:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only students can follow their applications"
+        )
+    return principal
+
+async def event_stream(channel: str):
+    async with broker.subscribe(channel) as subscription:
+        # Sent right away so the client knows the stream is live
+        yield ": connected\n\n"
+        while True:
+            message = await subscription.get(EVENT_KEEPALIVE_SECONDS)
+            if message is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(message)}\n\n"
+
+@router.get("/applications/events")
+async def application_events(request: Request, token: Optional[str] = None):
+    """Server-sent events for status changes of the student's applications."""
+    principal = await stream_principal(request.headers.get("authorization"), token)
+    return StreamingResponse(
+        event_stream(student_channel(principal.id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/applications/ws")
+async def application_events_ws(websocket: WebSocket, token: Optional[str] = None):
+    """The same status changes as JSON messages over a WebSocket."""
+    try:
+        principal = await stream_principal(websocket.headers.get("authorization"), token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    async with broker.subscribe(student_channel(principal.id)) as subscription:
+        # Clients have nothing to send; reading only notices when they leave
+        incoming = asyncio.ensure_future(websocket.receive())
+        try:
+            while True:
+                outgoing = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait({incoming, outgoing}, return_when=asyncio.FIRST_COMPLETED)
+                if outgoing in done:
+                    await websocket.send_json(outgoing.result())
+                else:
+                    outgoing.cancel()
+                if incoming in done:
+                    if incoming.result()["type"] == "websocket.disconnect":
+                        return
+                    incoming = asyncio.ensure_future(websocket.receive())
+        finally:
+            incoming.cancel()
@@ -1,17 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db, get_read_db
+from ..exports import stream_applications
+from ..pagination import page_limit, encode_cursor, decode_cursor
+from ..responses import rows_to_dicts, schema_columns
 from ..models import models
 from ..schemas import schemas
+from ..principals import Principal
+from ..stats import DIMENSIONS, record_changes
+from ..ranking import ranking_engine
+from ..search import MAX_QUERY_WORDS, search, words
+from ..events import publish_status_changes
+from ..etags import APPLICATIONS, bump_versions, conditional_get, etag_response, student_scope
 from ..routers.auth import get_current_user
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime
+from dotenv import load_dotenv
+import os
 
+load_dotenv()
 router = APIRouter()
 
-@router.get("/applications", response_model=List[schemas.FinancialAid])
+# Most pending applications one filter-based bulk update may transition
+BULK_STATUS_FILTER_LIMIT = int(os.getenv("BULK_STATUS_FILTER_LIMIT", "5000"))
+
+def filter_applications(query, student_id=None, min_amount=None, max_amount=None,
+                        created_after=None, created_before=None):
+    if student_id is not None:
+        query = query.where(models.FinancialAid.student_id == student_id)
+    if min_amount is not None:
+        query = query.where(models.FinancialAid.amount >= min_amount)
+    if max_amount is not None:
+        query = query.where(models.FinancialAid.amount <= max_amount)
+    if created_after is not None:
+        query = query.where(models.FinancialAid.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(models.FinancialAid.created_at < created_before)
+    return query
+
+@router.get("/applications", response_model=schemas.FinancialAidPage)
 async def get_all_applications(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    status_filter: Optional[models.ApplicationStatus] = Query(None, alias="status"),
+    student_id: Optional[int] = None,
+    min_amount: Optional[int] = None,
+    max_amount: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.user_type != models.UserType.MANAGER:
         raise HTTPException(
@@ -19,15 +60,163 @@ async def get_all_applications(
             detail="Only managers can view all applications"
         )
     
-    applications = db.query(models.FinancialAid).all()
-    return applications
+    etag, response = await conditional_get(db, request, APPLICATIONS)
+    if response is not None:
+        return response
+
+    # Keyset pagination on (created_at, id) so every page is an index range scan
+    query = select(*schema_columns(schemas.FinancialAid, models.FinancialAid))
+    if status_filter is not None:
+        query = query.where(models.FinancialAid.status == status_filter)
+    query = filter_applications(query, student_id, min_amount, max_amount, created_after, created_before)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, datetime, int)
+        query = query.where(
+            tuple_(models.FinancialAid.created_at, models.FinancialAid.id) > tuple_(last_created_at, last_id)
+        )
+    query = query.order_by(models.FinancialAid.created_at, models.FinancialAid.id).limit(limit + 1)
+
+    applications = rows_to_dicts((await db.execute(query)).all(), schemas.FinancialAid)
+    next_cursor = None
+    if len(applications) > limit:
+        applications = applications[:limit]
+        next_cursor = encode_cursor(applications[-1]["created_at"], applications[-1]["id"])
+    return etag_response(etag, schemas.FinancialAidPage, {"items": applications, "next_cursor": next_cursor})
+
+@router.get("/stats", response_model=List[schemas.ApplicationStat])
+async def get_application_stats(
+    dimension: Optional[Literal[DIMENSIONS]] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if current_user.user_type != models.UserType.MANAGER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only managers can view application statistics"
+        )
+    
+    # Reads the maintained summary, O(groups) regardless of application count
+    query = select(models.ApplicationStat).where(models.ApplicationStat.count != 0)
+    if dimension is not None:
+        query = query.where(models.ApplicationStat.dimension == dimension)
+    query = query.order_by(models.ApplicationStat.dimension, models.ApplicationStat.value, models.ApplicationStat.status)
+    return (await db.scalars(query)).all()
+
+@router.get("/applications/queue", response_model=schemas.RankedApplicationPage)
+async def get_review_queue(
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if current_user.user_type != models.UserType.MANAGER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only managers can view the review queue"
+        )
+    
+    # Pending applications by descending priority, see app/ranking.py
+    await ranking_engine.refresh(db)
+    ranked = ranking_engine.page(limit, decode_cursor(cursor, float, int) if cursor else None)
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = encode_cursor(ranked[-1][1], ranked[-1][0])
+
+    query = select(*schema_columns(schemas.FinancialAid, models.FinancialAid)).where(
+        models.FinancialAid.id.in_([application_id for application_id, _ in ranked])
+    )
+    applications = {row["id"]: row for row in rows_to_dicts((await db.execute(query)).all(), schemas.FinancialAid)}
+    offset = ranking_engine.score_offset()
+    items = [
+        {**applications[application_id], "score": round(score + offset, 6)}
+        for application_id, score in ranked
+        # Decided since the last refresh
+        if application_id in applications and applications[application_id]["status"] == models.ApplicationStatus.PENDING
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/applications/search", response_model=schemas.ApplicationSearchPage)
+async def search_applications(
+    q: str = Query(..., min_length=1, max_length=200),
+    status_filter: Optional[models.ApplicationStatus] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if current_user.user_type != models.UserType.MANAGER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only managers can search applications"
+        )
+    
+    query_words = words(q)[:MAX_QUERY_WORDS]
+    if not query_words:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query has no words"
+        )
+    
+    # Best match first, keyset paginated on (score, id); see app/search.py
+    found = await search(db, query_words, status_filter, limit, decode_cursor(cursor, float, int) if cursor else None)
+    next_cursor = None
+    if len(found) > limit:
+        found = found[:limit]
+        next_cursor = encode_cursor(found[-1][1], found[-1][0])
+
+    aids = models.FinancialAid.__table__
+    users = models.User.__table__
+    students = models.Student.__table__
+    query = (
+        select(
+            *schema_columns(schemas.FinancialAid, aids.c),
+            users.c.full_name, students.c.school, students.c.location,
+        )
+        .select_from(
+            aids.outerjoin(users, users.c.id == aids.c.student_id)
+            .outerjoin(students, students.c.id == aids.c.student_id)
+        )
+        .where(aids.c.id.in_([application_id for application_id, _ in found]))
+    )
+    applications = {row["id"]: row for row in rows_to_dicts((await db.execute(query)).all(), schemas.ApplicationSearchResult)}
+    items = [
+        {**applications[application_id], "score": round(score, 6)}
+        for application_id, score in found
+        # The in-memory index can trail a status change by a refresh
+        if application_id in applications
+        and (status_filter is None or applications[application_id]["status"] == status_filter)
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/applications/export")
+async def export_applications(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    status_filter: Optional[models.ApplicationStatus] = Query(None, alias="status"),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.user_type != models.UserType.MANAGER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only managers can export applications"
+        )
+    
+    if export_format == "csv":
+        media_type = "text/csv"
+    else:
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        stream_applications(export_format, status_filter),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="applications.{export_format}"'}
+    )
 
 @router.put("/applications/{aid_id}/status")
 async def update_application_status(
     aid_id: int,
-    status: models.ApplicationStatus,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    new_status: models.ApplicationStatus = Query(..., alias="status"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.user_type != models.UserType.MANAGER:
         raise HTTPException(
@@ -35,14 +224,138 @@ async def update_application_status(
             detail="Only managers can update application status"
         )
     
-    application = db.query(models.FinancialAid).filter(models.FinancialAid.id == aid_id).first()
-    if not application:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Application not found"
+    while True:
+        application = (await db.execute(
+            select(models.FinancialAid.student_id, models.FinancialAid.amount, models.FinancialAid.status)
+            .where(models.FinancialAid.id == aid_id)
+        )).first()
+        if not application:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Application not found"
+            )
+        student_id, amount, old_status = application
+        if old_status == new_status:
+            return {"message": "Application status updated successfully"}
+        # Only transitions from the status just read, so a concurrent update is never counted twice
+        changed_at = datetime.now()
+        changed = await db.scalar(
+            update(models.FinancialAid)
+            .where(models.FinancialAid.id == aid_id, models.FinancialAid.status == old_status)
+            .values(status=new_status, updated_at=changed_at)
+            .returning(models.FinancialAid.id)
+            .execution_options(synchronize_session=False)
         )
+        if changed is not None:
+            break
     
-    application.status = status
-    db.commit()
-    db.refresh(application)
+    await record_changes(db, [(student_id, amount, old_status, new_status)])
+    await bump_versions(db, APPLICATIONS, student_scope(student_id))
+    await db.commit()
+    await publish_status_changes([(student_id, aid_id, new_status, changed_at)])
     return {"message": "Application status updated successfully"}
+
+@router.post("/applications/status", response_model=schemas.BulkStatusResponse)
+async def bulk_update_application_status(
+    request: schemas.BulkStatusUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.user_type != models.UserType.MANAGER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only managers can update application status"
+        )
+    
+    if request.status == models.ApplicationStatus.PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Applications can only be moved out of pending"
+        )
+    if not request.applications and request.filter is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide applications or a filter"
+        )
+    criteria = request.filter.dict(exclude_none=True) if request.filter is not None else {}
+    if request.filter is not None and not criteria:
+        # An empty filter would match every pending application
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Filter needs at least one criterion"
+        )
+    if criteria and not request.applications:
+        matching = await db.scalar(filter_applications(
+            select(func.count()).select_from(models.FinancialAid)
+            .where(models.FinancialAid.status == models.ApplicationStatus.PENDING),
+            **criteria
+        ))
+        if matching > BULK_STATUS_FILTER_LIMIT:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=f"Filter matches {matching} pending applications, more than {BULK_STATUS_FILTER_LIMIT}; narrow it"
+            )
+    
+    # One set-based UPDATE ... RETURNING; only pending rows are transitioned
+    statement = update(models.FinancialAid).where(
+        models.FinancialAid.status == models.ApplicationStatus.PENDING
+    )
+    if request.applications:
+        versioned = [(a.id, a.updated_at) for a in request.applications if a.updated_at is not None]
+        unversioned = [a.id for a in request.applications if a.updated_at is None]
+        conditions = []
+        if versioned:
+            # Optimistic concurrency: skip rows changed since the client read them
+            conditions.append(tuple_(models.FinancialAid.id, models.FinancialAid.updated_at).in_(versioned))
+        if unversioned:
+            conditions.append(models.FinancialAid.id.in_(unversioned))
+        statement = statement.where(or_(*conditions))
+    if criteria:
+        statement = filter_applications(statement, **criteria)
+    changed_at = datetime.now()
+    statement = (
+        statement
+        .values(status=request.status, updated_at=changed_at)
+        .returning(models.FinancialAid.id, models.FinancialAid.student_id, models.FinancialAid.amount)
+        .execution_options(synchronize_session=False)
+    )
+
+    updated = (await db.execute(statement)).all()
+    await record_changes(db, [
+        (student_id, amount, models.ApplicationStatus.PENDING, request.status)
+        for _, student_id, amount in updated
+    ])
+    if updated:
+        await bump_versions(db, APPLICATIONS, *(student_scope(row[1]) for row in updated))
+    await db.commit()
+    await publish_status_changes([
+        (student_id, aid_id, request.status, changed_at) for aid_id, student_id, _ in updated
+    ])
+    updated_ids = {row[0] for row in updated}
+
+    if not request.applications:
+        results = [{"id": aid_id, "outcome": "updated"} for aid_id in sorted(updated_ids)]
+        return {"updated": len(updated_ids), "results": results}
+
+    # Explain the misses with a single lookup
+    missed = [a.id for a in request.applications if a.id not in updated_ids]
+    current = {}
+    if missed:
+        rows = await db.execute(
+            select(models.FinancialAid.id, models.FinancialAid.status)
+            .where(models.FinancialAid.id.in_(missed))
+        )
+        current = dict(rows.all())
+
+    results = []
+    for a in request.applications:
+        if a.id in updated_ids:
+            outcome = "updated"
+        elif a.id not in current:
+            outcome = "not_found"
+        elif current[a.id] != models.ApplicationStatus.PENDING:
+            outcome = "not_pending"
+        else:
+            outcome = "conflict"
+        results.append({"id": a.id, "outcome": outcome})
+    return {"updated": len(updated_ids), "results": results}
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Header
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import idempotency
+from ..database import get_db, get_read_db, remember_write
+from ..group_commit import GROUP_COMMIT, group_committer
+from ..instrumentation import timed
 from ..models import models
 from ..schemas import schemas
+from ..principals import Principal
+from ..stats import record_changes
+from ..responses import rows_to_dicts, schema_columns
+from ..etags import APPLICATIONS, bump_versions, conditional_get, etag_response, student_scope
 from ..routers.auth import get_current_user, get_password_hash
 
 router = APIRouter()
@@ -11,48 +20,104 @@ router = APIRouter()
 @router.post("/apply", response_model=schemas.FinancialAid)
 async def apply_for_aid(
     aid: schemas.FinancialAidCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    print("user", current_user)
     if current_user.user_type != models.UserType.STUDENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only students can apply for financial aid"
         )
     
+    if idempotency_key:
+        payload_hash = idempotency.request_hash(aid.dict())
+        response = await idempotency.lookup(db, current_user.id, idempotency_key, payload_hash)
+        if response is not None:
+            return response
+
+    if GROUP_COMMIT:
+        key = (idempotency_key, payload_hash) if idempotency_key else None
+        return await apply_in_group(current_user.id, aid, key, db)
+
     db_aid = models.FinancialAid(
         **aid.dict(),
         student_id=current_user.id
     )
     db.add(db_aid)
-    db.commit()
-    db.refresh(db_aid)
-    return db_aid
+    await record_changes(db, [(current_user.id, aid.amount, None, models.ApplicationStatus.PENDING)])
+    await bump_versions(db, APPLICATIONS, student_scope(current_user.id))
+    if not idempotency_key:
+        await db.commit()
+        await db.refresh(db_aid)
+        return db_aid
+
+    # The response is stored with the application, so it is built before the commit
+    await db.flush()
+    body = schemas.FinancialAid.model_validate(db_aid, from_attributes=True).model_dump_json().encode()
+    idempotency.remember(db, current_user.id, idempotency_key, payload_hash, status.HTTP_200_OK, body)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first; answer as it did
+        await db.rollback()
+        response = await idempotency.lookup(db, current_user.id, idempotency_key, payload_hash)
+        if response is None:
+            raise
+        return response
+    idempotency.remember_committed(current_user.id, idempotency_key, payload_hash, status.HTTP_200_OK, body)
+    return Response(body, media_type="application/json")
+
+async def apply_in_group(user_id: int, aid: schemas.FinancialAidCreate, key, db):
+    """Commit the application together with concurrent ones, see app/group_commit.py"""
+    # Hand the connection back while waiting, or waiting requests can starve the
+    # batch of one; this also commits an expired key the lookup freed
+    await db.commit()
+    try:
+        with timed("group_commit"):
+            result = await group_committer.submit(user_id, aid.dict(), key)
+    except IntegrityError:
+        if key is None:
+            raise
+        # A concurrent retry with the same key committed first; answer as it did
+        response = await idempotency.lookup(db, user_id, *key)
+        if response is None:
+            raise
+        return response
+    # The batch commits outside this request, so start the read-your-writes window here
+    remember_write(user_id)
+    if key is None:
+        return result
+    return Response(result, media_type="application/json")
 
 @router.get("/applications", response_model=List[schemas.FinancialAid])
 async def get_student_applications(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    print(current_user.full_name, current_user.email, current_user.id)
     if current_user.user_type != models.UserType.STUDENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only students can view their applications"
         )
-    print(db.query(models.FinancialAid).all())
-    # Fetch applications with student details
-    applications = db.query(models.FinancialAid).join(models.Student).filter(models.FinancialAid.student_id == current_user.id).all()
-    
-    return current_user.applications
+    etag, response = await conditional_get(db, request, student_scope(current_user.id))
+    if response is not None:
+        return response
+    rows = await db.execute(
+        select(*schema_columns(schemas.FinancialAid, models.FinancialAid))
+        .where(models.FinancialAid.student_id == current_user.id)
+        .order_by(models.FinancialAid.created_at, models.FinancialAid.id)
+    )
+    applications = rows_to_dicts(rows.all(), schemas.FinancialAid)
+    return etag_response(etag, List[schemas.FinancialAid], applications)
 
 @router.get("/applications/{student_id}", response_model=List[schemas.FinancialAid])
 async def get_applications_by_student_id(
     student_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Fetch applications for the specified student ID
-    applications = db.query(models.FinancialAid).filter(models.FinancialAid.student_id == student_id).all()
+    applications = (await db.scalars(select(models.FinancialAid).where(models.FinancialAid.student_id == student_id))).all()
     
     return applications
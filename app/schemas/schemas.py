@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 from ..models.models import UserType, ApplicationStatus, EconomicStatus, DisabilityStatus
 
@@ -26,9 +26,9 @@ class UserCreate(BaseModel):
         example=UserType.ADMIN
     )
 class StudentCreate(UserCreate):
-    age: EmailStr = Field(..., 
+    age: int = Field(..., 
         description="Age of the student",
-        example="18"
+        example=18
     )
     school: str = Field(..., 
         description="Most Recent School of the student",
@@ -38,11 +38,11 @@ class StudentCreate(UserCreate):
         description="Residential Location of the student",
         example="Gikondo"
     )
-    economic_status: UserType = Field(..., 
+    economic_status: EconomicStatus = Field(..., 
         description="Economic status of the student's family",
         example=EconomicStatus.MEDIUM
     )
-    disability_status: UserType = Field(..., 
+    disability_status: DisabilityStatus = Field(..., 
         description="Diability status of the student",
         example=DisabilityStatus.DISABLED
     )
@@ -55,9 +55,14 @@ class User(UserBase):
     class Config: 
         from_attribute = True
 
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     email: Optional[EmailStr] = None
@@ -74,12 +79,73 @@ class FinancialAid(FinancialAidBase):
     id: int
     student_id: int
     status: ApplicationStatus
-    created_at: datetime
-    updated_at: datetime
+    # Nullable columns; rows written outside the app may lack them
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
 
     class Config: 
         from_attribute = True
 
+class FinancialAidPage(BaseModel):
+    items: List[FinancialAid]
+    next_cursor: Optional[str] = None
+
+class RankedApplication(FinancialAid):
+    score: float
+
+class RankedApplicationPage(BaseModel):
+    items: List[RankedApplication]
+    next_cursor: Optional[str] = None
+
+class ApplicationSearchResult(FinancialAid):
+    student_name: Optional[str] = None
+    school: Optional[str] = None
+    location: Optional[str] = None
+    score: float
+
+class ApplicationSearchPage(BaseModel):
+    items: List[ApplicationSearchResult]
+    next_cursor: Optional[str] = None
+
+class ApplicationStat(BaseModel):
+    dimension: str
+    value: str
+    status: ApplicationStatus
+    count: int
+    total_amount: int
+
+    class Config:
+        from_attributes = True
+
+class ApplicationVersion(BaseModel):
+    id: int
+    updated_at: Optional[datetime] = Field(None,
+        description="updated_at as last read; the row is skipped if it has changed since"
+    )
+
+class ApplicationFilter(BaseModel):
+    student_id: Optional[int] = None
+    min_amount: Optional[int] = None
+    max_amount: Optional[int] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class BulkStatusUpdate(BaseModel):
+    status: ApplicationStatus = Field(...,
+        description="Target status for every matching pending application",
+        example=ApplicationStatus.APPROVED
+    )
+    applications: List[ApplicationVersion] = Field(default_factory=list, max_length=5000)
+    filter: Optional[ApplicationFilter] = None
+
+class BulkStatusResult(BaseModel):
+    id: int
+    outcome: Literal["updated", "not_found", "not_pending", "conflict"]
+
+class BulkStatusResponse(BaseModel):
+    updated: int
+    results: List[BulkStatusResult]
+
 class LoginRequest(BaseModel):
     email: EmailStr = Field(..., 
         description="User's email address",
@@ -90,6 +156,12 @@ class LoginRequest(BaseModel):
         example="strongpassword123"
     )
 
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(...,
+        max_length=128,
+        description="Refresh token from login or the previous refresh"
+    )
+
 class EmailRequest(BaseModel):
     email: EmailStr = Field(..., 
         description="Email address for password reset",
@@ -126,4 +198,13 @@ class UserResponse(BaseModel):
     email_verified: bool
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ImportRowError(BaseModel):
+    row: int
+    email: Optional[str] = None
+    errors: List[str]
+
+class StudentImportResult(BaseModel):
+    created: int
+    errors: List[ImportRowError]
@@ -0,0 +1,335 @@
+"""Application search by student name, school, location and purpose.
+
+A query is split into words. An application matches when every word
+matches one of its fields, as a whole word or a word prefix, so
+"mar kig" finds Maria from Kigali. Results are ranked by how well
+they match, name matches first, and paged by (score, id).
+
+On PostgreSQL the database does the work. Each field has a GIN index on
+its 'simple' tsvector, and names, schools and locations also have pg_trgm
+trigram indexes, which tolerate misspellings. The indexes are declared on
+the models for PostgreSQL only.
+
+Elsewhere each worker keeps an InvertedIndex in memory, scored with
+NumPy, without the misspelling tolerance. Like the review queue, it
+picks up applications whose updated_at moved every
+SEARCH_REFRESH_SECONDS. Everything is reloaded every
+SEARCH_FULL_RELOAD_SECONDS, for edited student profiles.
+Set SEARCH_BACKEND to "postgresql" or "memory" to override the choice.
+"""
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import Float, and_, cast, func, intersect, literal_column, or_, select, union
+from datetime import timedelta
+from dotenv import load_dotenv
+from array import array
+from .database import engine
+from .models import models
+import asyncio
+import bisect
+import math
+import numpy as np
+import os
+import re
+import time
+
+load_dotenv()
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "1"))
+SEARCH_FULL_RELOAD_SECONDS = float(os.getenv("SEARCH_FULL_RELOAD_SECONDS", "3600"))
+SEARCH_REFRESH_OVERLAP_SECONDS = float(os.getenv("SEARCH_REFRESH_OVERLAP_SECONDS", "5"))
+MAX_QUERY_WORDS = 8
+# Compact the in-memory index once retired slots outnumber live ones and this
+COMPACT_MIN_RETIRED = 10000
+
+# Relative weight of a match in each field
+NAME_WEIGHT = 1.0
+PLACE_WEIGHT = 0.5
+PURPOSE_WEIGHT = 0.3
+
+WORD = re.compile(r"[^\W_]+")
+STATUS_CODES = {status: code for code, status in enumerate(models.ApplicationStatus)}
+
+def words(text: str) -> list:
+    return WORD.findall(text.lower()) if text else []
+
+def use_postgresql() -> bool:
+    if SEARCH_BACKEND == "auto":
+        return engine.dialect.name == "postgresql"
+    return SEARCH_BACKEND == "postgresql"
+
+# PostgreSQL: these match the expression indexes on the models exactly
+NAME_DOCUMENT = literal_column("to_tsvector('simple', coalesce(users.full_name, ''))")
+PLACE_DOCUMENT = literal_column(
+    "to_tsvector('simple', coalesce(students.school, '') || ' ' || coalesce(students.location, ''))"
+)
+PURPOSE_DOCUMENT = literal_column("to_tsvector('simple', coalesce(financial_aids.purpose, ''))")
+
+def _tsquery(text: str):
+    return func.to_tsquery(literal_column("'simple'"), text)
+
+def _word_matches(word: str):
+    """Ids of applications with `word` in any field; each branch is one GIN index scan."""
+    aids = models.FinancialAid.__table__
+    users = models.User.__table__
+    students = models.Student.__table__
+    prefix = _tsquery(f"{word}:*")
+    return union(
+        select(aids.c.id).where(PURPOSE_DOCUMENT.op("@@")(prefix)),
+        select(aids.c.id).join(users, users.c.id == aids.c.student_id).where(
+            or_(NAME_DOCUMENT.op("@@")(prefix), users.c.full_name.op("%>")(word))
+        ),
+        select(aids.c.id).join(students, students.c.id == aids.c.student_id).where(
+            or_(
+                PLACE_DOCUMENT.op("@@")(prefix),
+                students.c.school.op("%>")(word),
+                students.c.location.op("%>")(word),
+            )
+        ),
+    )
+
+async def search_postgresql(db, query_words: list, status, limit: int, after=None) -> list:
+    aids = models.FinancialAid.__table__
+    users = models.User.__table__
+    students = models.Student.__table__
+    matches = [_word_matches(word) for word in query_words]
+    matched = matches[0] if len(matches) == 1 else intersect(*matches)
+
+    any_word = _tsquery(" | ".join(f"{word}:*" for word in query_words))
+    text = " ".join(query_words)
+    score = cast(
+        NAME_WEIGHT * (func.ts_rank(NAME_DOCUMENT, any_word)
+                       + func.word_similarity(text, func.coalesce(users.c.full_name, "")))
+        + PLACE_WEIGHT * (func.ts_rank(PLACE_DOCUMENT, any_word)
+                          + func.greatest(func.word_similarity(text, func.coalesce(students.c.school, "")),
+                                          func.word_similarity(text, func.coalesce(students.c.location, ""))))
+        + PURPOSE_WEIGHT * func.ts_rank(PURPOSE_DOCUMENT, any_word),
+        Float,
+    )
+    ranked = (
+        select(aids.c.id, score.label("score"))
+        .select_from(
+            aids.outerjoin(users, users.c.id == aids.c.student_id)
+            .outerjoin(students, students.c.id == aids.c.student_id)
+        )
+        .where(aids.c.id.in_(matched))
+    )
+    if status is not None:
+        ranked = ranked.where(aids.c.status == status)
+    ranked = ranked.subquery()
+
+    page = select(ranked.c.id, ranked.c.score)
+    if after is not None:
+        last_score, last_id = after
+        page = page.where(or_(
+            ranked.c.score < last_score,
+            and_(ranked.c.score == last_score, ranked.c.id > last_id),
+        ))
+    page = page.order_by(ranked.c.score.desc(), ranked.c.id).limit(limit + 1)
+    return [(row.id, row.score) for row in (await db.execute(page)).all()]
+
+def index_query():
+    aids = models.FinancialAid.__table__
+    users = models.User.__table__
+    students = models.Student.__table__
+    return select(
+        aids.c.id, aids.c.status, aids.c.updated_at, aids.c.purpose,
+        users.c.full_name, students.c.school, students.c.location,
+    ).select_from(
+        aids.outerjoin(users, users.c.id == aids.c.student_id)
+        .outerjoin(students, students.c.id == aids.c.student_id)
+    )
+
+def document_terms(row) -> dict:
+    """term -> weight of the best field it occurs in, for one index_query() row."""
+    terms = {}
+    for text, weight in ((row.purpose, PURPOSE_WEIGHT), (row.school, PLACE_WEIGHT),
+                         (row.location, PLACE_WEIGHT), (row.full_name, NAME_WEIGHT)):
+        for term in words(text):
+            if terms.get(term, 0) < weight:
+                terms[term] = weight
+    return terms
+
+class InvertedIndex:
+    """Columnar inverted index of applications.
+
+    Every indexed application version gets a slot, and each term maps to
+    the slots it occurs in with their field weights.
+
+    Scoring, intersecting and picking the top of the results all run over
+    NumPy views of those arrays. An update retires the old slot and
+    appends a new one; retired slots are compacted away once they outnumber
+    the live ones.
+    """
+
+    STATE = ("ids", "status_codes", "alive", "slots", "versions", "postings", "retired",
+             "_vocabulary", "_vocabulary_stale")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.status_codes = array("b")
+        self.alive = bytearray()
+        self.slots = {}
+        # id -> updated_at of the indexed version
+        self.versions = {}
+        # term -> (slots, weights)
+        self.postings = {}
+        self.retired = 0
+        self._vocabulary = []
+        self._vocabulary_stale = False
+        self.watermark = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self._lock = None
+
+    @classmethod
+    def build(cls, rows) -> "InvertedIndex":
+        index = cls()
+        index.upsert(rows)
+        return index
+
+    def _adopt(self, other: "InvertedIndex"):
+        for name in self.STATE:
+            setattr(self, name, getattr(other, name))
+
+    def replace(self, rows):
+        self._adopt(InvertedIndex.build(rows))
+
+    def remove(self, ids):
+        for application_id in ids:
+            slot = self.slots.pop(application_id, None)
+            self.versions.pop(application_id, None)
+            if slot is not None:
+                self.alive[slot] = 0
+                self.retired += 1
+
+    def upsert(self, rows):
+        for row in rows:
+            slot = self.slots.get(row.id)
+            if slot is not None:
+                self.alive[slot] = 0
+                self.retired += 1
+            slot = self.slots[row.id] = len(self.ids)
+            self.versions[row.id] = row.updated_at
+            self.ids.append(row.id)
+            self.status_codes.append(STATUS_CODES.get(row.status, -1))
+            self.alive.append(1)
+            for term, weight in document_terms(row).items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array("q"), array("d"))
+                    self._vocabulary_stale = True
+                posting[0].append(slot)
+                posting[1].append(weight)
+        if self.retired > max(len(self.slots), COMPACT_MIN_RETIRED):
+            self._compact()
+
+    def _compact(self):
+        alive = np.frombuffer(self.alive, dtype=bool)
+        renumbered = np.cumsum(alive) - 1
+        postings = {}
+        for term, (slots, weights) in self.postings.items():
+            slots = np.frombuffer(slots, dtype=np.int64)
+            kept = alive[slots]
+            if kept.any():
+                postings[term] = (array("q", renumbered[slots[kept]].tobytes()),
+                                  array("d", np.frombuffer(weights)[kept].tobytes()))
+        ids = np.frombuffer(self.ids, dtype=np.int64)[alive]
+        self.status_codes = array("b", np.frombuffer(self.status_codes, dtype=np.int8)[alive].tobytes())
+        del alive
+        self.ids = array("q", ids.tobytes())
+        self.slots = dict(zip(ids.tolist(), range(len(ids))))
+        self.alive = bytearray(b"\x01") * len(ids)
+        self.postings = postings
+        self.retired = 0
+        self._vocabulary_stale = True
+
+    def _expand(self, word: str) -> list:
+        """Every indexed term starting with `word`."""
+        if self._vocabulary_stale:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_stale = False
+        start = bisect.bisect_left(self._vocabulary, word)
+        end = bisect.bisect_left(self._vocabulary, word + "\U0010ffff")
+        return self._vocabulary[start:end]
+
+    def search(self, query_words: list, status, limit: int, after=None) -> list:
+        """The next `limit` + 1 (id, score) pairs after the (score, id) key `after`."""
+        size = len(self.ids)
+        if not size:
+            return []
+        live = max(len(self.slots), 1)
+        matched = np.frombuffer(self.alive, dtype=bool).copy()
+        if status is not None:
+            matched &= np.frombuffer(self.status_codes, dtype=np.int8) == STATUS_CODES[status]
+        scores = np.zeros(size)
+        for word in query_words:
+            word_scores = np.zeros(size)
+            for term in self._expand(word):
+                slots, weights = self.postings[term]
+                slots = np.frombuffer(slots, dtype=np.int64)
+                # Rare terms say more; a prefix match counts half of a whole word
+                idf = math.log(1 + live / len(slots)) * (1.0 if term == word else 0.5)
+                word_scores[slots] = np.maximum(word_scores[slots], np.frombuffer(weights) * idf)
+            matched &= word_scores > 0
+            if not matched.any():
+                return []
+            scores += word_scores
+
+        ids = np.frombuffer(self.ids, dtype=np.int64)
+        candidates = np.flatnonzero(matched)
+        if after is not None:
+            last_score, last_id = after
+            candidate_scores = scores[candidates]
+            candidates = candidates[(candidate_scores < last_score)
+                                    | ((candidate_scores == last_score) & (ids[candidates] > last_id))]
+        wanted = limit + 1
+        if len(candidates) > wanted:
+            # Partial selection, keeping every tie of the cut-off score so ids order them
+            cutoff = np.partition(scores[candidates], len(candidates) - wanted)[len(candidates) - wanted]
+            candidates = candidates[scores[candidates] >= cutoff]
+        order = np.lexsort((ids[candidates], -scores[candidates]))[:wanted]
+        chosen = candidates[order]
+        return list(zip(ids[chosen].tolist(), scores[chosen].tolist()))
+
+    async def refresh(self, db):
+        """Bring the index up to date: a full load when due, otherwise only changed rows."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            if self.loaded_at is None or now - self.loaded_at >= SEARCH_FULL_RELOAD_SECONDS:
+                aids = models.FinancialAid.__table__
+                watermark = await db.scalar(select(func.max(aids.c.updated_at)))
+                rows = (await db.execute(index_query())).all()
+                # Built off the event loop, then swapped in whole
+                self._adopt(await run_in_threadpool(InvertedIndex.build, rows))
+                self.watermark = watermark
+                self.loaded_at = self.refreshed_at = now
+            elif now - self.refreshed_at >= SEARCH_REFRESH_SECONDS:
+                await self._load_changes(db)
+                self.refreshed_at = now
+
+    async def _load_changes(self, db):
+        aids = models.FinancialAid.__table__
+        query = index_query()
+        if self.watermark is not None:
+            query = query.where(
+                aids.c.updated_at >= self.watermark - timedelta(seconds=SEARCH_REFRESH_OVERLAP_SECONDS)
+            )
+        rows = (await db.execute(query)).all()
+        if not rows:
+            return
+        newest = max(row.updated_at for row in rows)
+        self.watermark = max(self.watermark, newest) if self.watermark else newest
+        # The overlap re-reads rows already indexed; only re-index the ones that moved
+        self.upsert([row for row in rows if self.versions.get(row.id) != row.updated_at])
+
+search_index = InvertedIndex()
+
+async def search(db, query_words: list, status, limit: int, after=None) -> list:
+    """The next `limit` + 1 (application id, score) pairs, best first."""
+    if use_postgresql():
+        return await search_postgresql(db, query_words, status, limit, after)
+    await search_index.refresh(db)
+    return search_index.search(query_words, status, limit, after)
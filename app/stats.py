@@ -0,0 +1,131 @@
+"""Incrementally maintained application statistics.
+
+Every write that creates an application or changes its status applies a
+counter delta to application_stats in the same transaction. Backfill or
+repair the table with:
+
+    python -m app.stats rebuild
+"""
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, select
+from .database import SessionLocal, dialect_insert
+from .models import models
+import sys
+
+# "all" is the ungrouped total per status
+DIMENSIONS = ("all", "economic_status", "disability_status", "school", "location")
+UNKNOWN = "unknown"
+
+def _group_values(attributes) -> list:
+    """(dimension, value) pairs an application is counted under."""
+    economic_status, disability_status, school, location = attributes or (None,) * 4
+    values = [economic_status, disability_status, school, location]
+    values = [v.value if hasattr(v, "value") else v for v in values]
+    return [("all", "")] + [
+        (dimension, value if value is not None else UNKNOWN)
+        for dimension, value in zip(DIMENSIONS[1:], values)
+    ]
+
+async def _student_attributes(db, student_ids) -> dict:
+    students = models.Student.__table__
+    rows = await db.execute(
+        select(
+            students.c.id, students.c.economic_status, students.c.disability_status,
+            students.c.school, students.c.location,
+        ).where(students.c.id.in_(set(student_ids)))
+    )
+    return {row[0]: tuple(row[1:]) for row in rows.all()}
+
+def _upsert():
+    statement = dialect_insert(models.ApplicationStat)
+    return statement.on_conflict_do_update(
+        index_elements=["dimension", "value", "status"],
+        set_={
+            "count": models.ApplicationStat.count + statement.excluded.count,
+            "total_amount": models.ApplicationStat.total_amount + statement.excluded.total_amount,
+        },
+    )
+
+async def _apply(db, deltas: dict):
+    # One order for every writer, so concurrent transactions lock stat rows without deadlocking
+    ordered = sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1], item[0][2].name))
+    rows = [
+        {"dimension": dimension, "value": value, "status": status, "count": count, "total_amount": amount}
+        for (dimension, value, status), (count, amount) in ordered
+        if count or amount
+    ]
+    if rows:
+        await db.execute(_upsert(), rows)
+
+async def record_changes(db, changes):
+    """Apply counter deltas for (student_id, amount, old_status, new_status) changes.
+
+    old_status is None for a new application. Must run before the caller commits.
+    """
+    changes = [c for c in changes if c[2] != c[3]]
+    if not changes:
+        return
+    attributes = await _student_attributes(db, [c[0] for c in changes])
+    deltas = defaultdict(lambda: [0, 0])
+    for student_id, amount, old_status, new_status in changes:
+        amount = amount or 0
+        for dimension, value in _group_values(attributes.get(student_id)):
+            if old_status is not None:
+                deltas[(dimension, value, old_status)][0] -= 1
+                deltas[(dimension, value, old_status)][1] -= amount
+            deltas[(dimension, value, new_status)][0] += 1
+            deltas[(dimension, value, new_status)][1] += amount
+    await _apply(db, deltas)
+
+def rebuild():
+    """Recompute application_stats from scratch with one GROUP BY per dimension."""
+    students = models.Student.__table__
+    columns = {
+        "economic_status": students.c.economic_status,
+        "disability_status": students.c.disability_status,
+        "school": students.c.school,
+        "location": students.c.location,
+    }
+    with SessionLocal() as db:
+        db.execute(delete(models.ApplicationStat))
+        rows = []
+        for dimension in DIMENSIONS:
+            group = columns.get(dimension)
+            keys = [models.FinancialAid.status] + ([group] if group is not None else [])
+            query = (
+                select(*keys, func.count(), func.coalesce(func.sum(models.FinancialAid.amount), 0))
+                .select_from(models.FinancialAid)
+                .outerjoin(students, students.c.id == models.FinancialAid.student_id)
+                .group_by(*keys)
+            )
+            for row in db.execute(query):
+                if row[0] is None:
+                    continue
+                if group is None:
+                    value = ""
+                elif row[1] is None:
+                    value = UNKNOWN
+                else:
+                    value = row[1].value if hasattr(row[1], "value") else str(row[1])
+                rows.append({
+                    "dimension": dimension, "value": value, "status": row[0],
+                    "count": row[-2], "total_amount": row[-1],
+                })
+        # NULL schools and the literal "unknown" can land in the same group
+        merged = {}
+        for row in rows:
+            key = (row["dimension"], row["value"], row["status"])
+            if key in merged:
+                merged[key]["count"] += row["count"]
+                merged[key]["total_amount"] += row["total_amount"]
+            else:
+                merged[key] = row
+        if merged:
+            db.execute(insert(models.ApplicationStat), list(merged.values()))
+        db.commit()
+        return len(merged)
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m app.stats rebuild")
+    print(f"Rebuilt {rebuild()} application stat groups")
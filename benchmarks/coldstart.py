@@ -0,0 +1,113 @@
+"""Cold-start benchmark: how long a fresh worker takes to serve its first request.
+
+Each run starts a new interpreter and measures importing app.main, running
+the startup hooks, and the first GET / and GET /openapi.json. With
+--uvicorn it also times a real `uvicorn app.main:app` from spawn until it
+answers. --target-ms fails the run when the median import-to-ready time
+exceeds the autoscaling budget:
+
+    python -m app.openapi build
+    python benchmarks/coldstart.py --runs 5 --uvicorn --target-ms 1500
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the fresh interpreter; prints one JSON line of timings in ms
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def main():
+    import httpx
+    timings = {"import_ms": (imported - started) * 1000}
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        timings["startup_ms"] = (ready - imported) * 1000
+        timings["ready_ms"] = (ready - started) * 1000
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://cold") as client:
+            for path in ("/", "/openapi.json"):
+                begin = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                timings["first " + path + " ms"] = (time.perf_counter() - begin) * 1000
+    print(json.dumps(timings))
+
+asyncio.run(main())
+"""
+
+def probe(env) -> dict:
+    output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def uvicorn_ready(env) -> float:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    response.read()
+                return (time.perf_counter() - started) * 1000
+            except OSError:
+                if server.poll() is not None or time.perf_counter() - started > 60:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--uvicorn", action="store_true", help="also time spawn-to-first-response")
+    parser.add_argument("--target-ms", type=float, help="fail if median ready_ms is above this")
+    parser.add_argument("--output", help="write the medians as JSON")
+    args = parser.parse_args()
+
+    env = os.environ.copy()
+    defaults = {
+        # Never connected to: startup does no database I/O unless STARTUP_SCHEMA_CHECK is set
+        "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.gettempdir(), "aid-coldstart.db"),
+        "SECRET_KEY": "benchmark-secret",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    }
+    for key, value in defaults.items():
+        env.setdefault(key, value)
+
+    runs = [probe(env) for _ in range(args.runs)]
+    medians = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+    if args.uvicorn:
+        medians["uvicorn_first_response_ms"] = round(statistics.median(uvicorn_ready(env) for _ in range(args.runs)), 1)
+
+    print(f"median of {args.runs} cold starts")
+    for key, value in medians.items():
+        print(f"  {key:28s} {value:10.1f}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(medians, indent=2) + "\n")
+    if args.target_ms and medians["ready_ms"] > args.target_ms:
+        sys.exit(f"ready_ms {medians['ready_ms']} is over the {args.target_ms} ms target")
+
+if __name__ == "__main__":
+    main()
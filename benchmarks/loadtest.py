@@ -0,0 +1,326 @@
+"""Load test and latency benchmark for the API.
+
+Seeds a local database, then drives a realistic mix of logins, token
+refreshes, aid applications, list calls and status updates from concurrent clients,
+either in-process through httpx's ASGI transport or over a real uvicorn
+socket, and writes req/s and p50/p95/p99 per endpoint as JSON:
+
+    python benchmarks/loadtest.py --transport both --clients 32 --duration 20 \
+        --output bench.json --compare previous.json
+
+The database defaults to a throwaway SQLite file; pass --database-url to
+use a local PostgreSQL. Set DB_MODE=async in the environment to benchmark
+the async engine.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+PASSWORD = "benchmark-password"
+
+# (label, weight) per role. Clients renew their access token mostly with the
+# refresh token, as real ones do, and occasionally log in again with bcrypt.
+STUDENT_MIX = [
+    ("POST /auth/login", 1),
+    ("POST /auth/refresh", 4),
+    ("GET /students/applications", 55),
+    ("POST /students/apply", 40),
+]
+MANAGER_MIX = [
+    ("POST /auth/login", 1),
+    ("POST /auth/refresh", 4),
+    ("GET /managers/applications", 65),
+    ("PUT /managers/applications/{aid_id}/status", 30),
+]
+
+def configure_environment(database_url: str):
+    """The app reads its settings at import time, so this runs before importing it."""
+    os.environ["DATABASE_URL"] = database_url
+    defaults = {
+        "SECRET_KEY": "benchmark-secret",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+        "SMTP_SERVER": "localhost",
+        "SMTP_PORT": "25",
+        # Every simulated client shares 127.0.0.1, so per-client login throttling is off
+        "LOGIN_RATE_PER_MINUTE": "0",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+def migrate_and_seed(students: int, managers: int, applications: int):
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import models
+    from app.passwords import pwd_context
+    from app.stats import rebuild
+
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    command.upgrade(config, "head")
+
+    hashed = pwd_context.hash(PASSWORD)
+    rng = random.Random(42)
+    with SessionLocal() as db:
+        db.execute(insert(models.Student), [{
+            "email": f"student{i}@bench.example.com",
+            "password": hashed,
+            "full_name": f"Student {i}",
+            "user_type": models.UserType.STUDENT,
+            "is_active": True,
+            "email_verified": True,
+            "age": rng.randint(16, 30),
+            "school": f"School {i % 20}",
+            "location": f"District {i % 30}",
+            "economic_status": rng.choice(list(models.EconomicStatus)),
+            "disability_status": rng.choice(list(models.DisabilityStatus)),
+        } for i in range(students)])
+        db.execute(insert(models.User), [{
+            "email": f"manager{i}@bench.example.com",
+            "password": hashed,
+            "full_name": f"Manager {i}",
+            "user_type": models.UserType.MANAGER,
+            "is_active": True,
+            "email_verified": True,
+        } for i in range(managers)])
+        db.commit()
+        student_ids = [row[0] for row in db.execute(
+            models.User.__table__.select()
+            .with_only_columns(models.User.id)
+            .where(models.User.user_type == models.UserType.STUDENT)
+        )]
+        if applications:
+            db.execute(insert(models.FinancialAid), [{
+                "student_id": rng.choice(student_ids),
+                "amount": rng.randint(50, 5000),
+                "purpose": "seeded application",
+                "status": models.ApplicationStatus.PENDING,
+            } for _ in range(applications)])
+            db.commit()
+    rebuild()
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, label: str, seconds: float, ok: bool):
+        self.samples.setdefault(label, []).append(seconds)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        result = {}
+        for label, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            result[label] = {
+                "count": len(samples),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(samples) / elapsed, 2),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            }
+        total = sum(len(s) for s in self.samples.values())
+        result["_total"] = {
+            "count": total,
+            "errors": sum(self.errors.values()),
+            "rps": round(total / elapsed, 2),
+        }
+        return result
+
+def percentile(sorted_samples, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples) + 0.5) - 1))
+    return sorted_samples[rank]
+
+async def timed(client, recorder: Recorder, label: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400
+    except Exception:
+        response, ok = None, False
+    recorder.record(label, time.perf_counter() - start, ok)
+    return response
+
+async def run_client(client, recorder: Recorder, email: str, role: str, deadline: float, seed: int):
+    rng = random.Random(seed)
+    mix = STUDENT_MIX if role == "student" else MANAGER_MIX
+    labels = [label for label, _ in mix]
+    weights = [weight for _, weight in mix]
+    headers = {}
+    tokens = {}
+    known_ids = []
+
+    def use(response):
+        if response is not None and response.status_code == 200:
+            body = response.json()
+            headers["Authorization"] = "Bearer " + body["access_token"]
+            tokens["refresh"] = body["refresh_token"]
+
+    async def login():
+        use(await timed(client, recorder, "POST /auth/login", "POST", "/auth/login",
+                        json={"email": email, "password": PASSWORD}))
+
+    async def refresh():
+        use(await timed(client, recorder, "POST /auth/refresh", "POST", "/auth/refresh",
+                        json={"refresh_token": tokens.get("refresh", "")}))
+
+    await login()
+    while time.perf_counter() < deadline:
+        label = rng.choices(labels, weights)[0]
+        if label == "POST /auth/login":
+            await login()
+        elif label == "POST /auth/refresh":
+            await refresh()
+        elif label == "GET /students/applications":
+            await timed(client, recorder, label, "GET", "/students/applications", headers=headers)
+        elif label == "POST /students/apply":
+            await timed(client, recorder, label, "POST", "/students/apply", headers=headers,
+                        json={"amount": rng.randint(50, 5000), "purpose": "benchmark"})
+        elif label == "GET /managers/applications":
+            response = await timed(client, recorder, label, "GET", "/managers/applications",
+                                   headers=headers, params={"status": "pending", "limit": 50})
+            if response is not None and response.status_code == 200:
+                known_ids = [item["id"] for item in response.json()["items"]]
+        elif known_ids:
+            aid_id = known_ids.pop(rng.randrange(len(known_ids)))
+            await timed(client, recorder, label, "PUT", f"/managers/applications/{aid_id}/status",
+                        headers=headers, params={"status": rng.choice(["approved", "rejected"])})
+
+async def drive(base_url: str, transport, clients: int, duration: float, students: int, managers: int) -> dict:
+    import httpx
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        tasks = []
+        for i in range(clients):
+            # Roughly one manager per five clients
+            if i % 5 == 4 and managers:
+                email, role = f"manager{i % managers}@bench.example.com", "manager"
+            else:
+                email, role = f"student{i % students}@bench.example.com", "student"
+            tasks.append(run_client(client, recorder, email, role, deadline, seed=i))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return recorder.summary(elapsed)
+
+async def bench_asgi(args) -> dict:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    return await drive("http://bench", transport, args.clients, args.duration, args.students, args.managers)
+
+def bench_uvicorn(args) -> dict:
+    """Run uvicorn as its own process, as in production, and drive it over TCP."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=os.environ.copy(),
+    )
+    try:
+        started = time.monotonic()
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() - started > 30:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.1)
+        return asyncio.run(drive(f"http://127.0.0.1:{port}", None, args.clients, args.duration,
+                                 args.students, args.managers))
+    finally:
+        server.terminate()
+        server.wait()
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(current: dict, previous: dict):
+    for transport, endpoints in current["results"].items():
+        before = previous.get("results", {}).get(transport, {})
+        print(f"\n{transport}")
+        for label, stats in endpoints.items():
+            old = before.get(label)
+            if not old:
+                print(f"  {label:48s} {stats['rps']:>10.1f} req/s (new)")
+                continue
+            line = f"  {label:48s} {stats['rps']:>10.1f} req/s ({stats['rps'] - old['rps']:+.1f})"
+            if "p99_ms" in stats and "p99_ms" in old:
+                line += f"  p99 {stats['p99_ms']:.1f}ms ({stats['p99_ms'] - old['p99_ms']:+.1f})"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to a fresh SQLite file")
+    parser.add_argument("--transport", choices=["asgi", "uvicorn", "both"], default="asgi")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per transport")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--managers", type=int, default=10)
+    parser.add_argument("--applications", type=int, default=5000)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", help="previous output file to diff against")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="aid-bench-"), "bench.db")
+    configure_environment(database_url)
+    migrate_and_seed(args.students, args.managers, args.applications)
+
+    results = {}
+    if args.transport in ("asgi", "both"):
+        results["asgi"] = asyncio.run(bench_asgi(args))
+    if args.transport in ("uvicorn", "both"):
+        results["uvicorn"] = bench_uvicorn(args)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "db_mode": os.getenv("DB_MODE", "sync"),
+            "database": database_url.split("://", 1)[0],
+            "clients": args.clients,
+            "duration": args.duration,
+            "students": args.students,
+            "managers": args.managers,
+            "applications": args.applications,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""In-memory search index benchmark on synthetic applications.
+
+Times building the inverted index over --rows applications, a few typical
+manager queries (first page and the next one), and re-indexing --changed
+rows:
+
+    python benchmarks/search.py --rows 1000000 --changed 1000
+
+On PostgreSQL searches run in the database instead; use EXPLAIN ANALYZE
+on the query logged for GET /managers/applications/search there.
+"""
+from pathlib import Path
+from datetime import datetime
+from types import SimpleNamespace
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+FIRST_NAMES = ["Maria", "Eric", "Aline", "Jean", "Grace", "Patrick", "Diane", "Claude", "Alice", "Emmanuel"]
+LAST_NAMES = ["Uwase", "Habimana", "Mugisha", "Niyonzima", "Ingabire", "Mukamana", "Nshimiyimana", "Uwimana"]
+PURPOSES = ["tuition fees", "laptop for school", "rent and food", "books and supplies",
+            "transport to campus", "exam registration", "medical costs", "uniform and shoes"]
+
+def synthetic_rows(count: int, start_id: int, rng: random.Random) -> list:
+    from app.models import models
+
+    now = datetime.now()
+    return [
+        SimpleNamespace(
+            id=start_id + i,
+            status=rng.choice(list(models.ApplicationStatus)),
+            updated_at=now,
+            purpose=f"{rng.choice(PURPOSES)} term {rng.randint(1, 3)}",
+            full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.randint(0, 20000)}",
+            school=f"School {rng.randint(0, 500)}",
+            location=f"District {rng.randint(0, 30)}",
+        )
+        for i in range(count)
+    ]
+
+def timed(label: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    print(f"  {label:40s} {(time.perf_counter() - start) * 1000:10.2f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--changed", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    # The index only needs the models, never a connection
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from app.search import InvertedIndex, words
+
+    rng = random.Random(7)
+    rows = synthetic_rows(args.rows, 1, rng)
+    index = InvertedIndex()
+
+    print(f"{args.rows} applications")
+    timed("build index", index.replace, rows)
+    print(f"  {len(index.postings)} distinct terms")
+    for query in ["maria uwase", "laptop", "school 42", "district 7 rent", "mug", "grace 1234"]:
+        first = timed(f"'{query}' first page", index.search, words(query), None, args.limit)
+        if len(first) > args.limit:
+            last_id, last_score = first[args.limit - 1]
+            timed(f"'{query}' next page", index.search, words(query), None, args.limit, (last_score, last_id))
+
+    changed = synthetic_rows(args.changed, 1, rng)
+    timed(f"re-index {args.changed} changed rows", index.upsert, changed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Serialization benchmark for large list responses.
+
+Compares, on the same seeded rows, the time to turn a query into a
+response body via:
+
+  orm+validate   ORM objects -> pydantic per row -> jsonable_encoder -> json
+  columns+model  column tuples -> response_model validation -> pydantic JSON
+  columns+fast   column tuples -> trusted dicts -> orjson (FAST_RESPONSES)
+
+    python benchmarks/serialization.py --rows 10000 --repeat 5
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the timings as JSON")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="aid-serial-"), "bench.db")
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import insert, select
+    from app.database import Base, SessionLocal, engine
+    from app.models import models
+    from app.responses import dumps, orjson, rows_to_dicts, schema_columns
+    from app.schemas import schemas
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.FinancialAid), [{
+            "student_id": i % 500 + 1,
+            "amount": 100 + i,
+            "purpose": f"tuition and books {i}",
+            "status": list(models.ApplicationStatus)[i % 3],
+        } for i in range(args.rows)])
+        db.commit()
+
+    adapter = TypeAdapter(List[schemas.FinancialAid])
+
+    def orm_validate(db):
+        rows = db.scalars(select(models.FinancialAid)).all()
+        validated = adapter.validate_python(rows, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def columns_model(db):
+        rows = db.execute(select(*schema_columns(schemas.FinancialAid, models.FinancialAid))).all()
+        return adapter.dump_json(adapter.validate_python(rows_to_dicts(rows, schemas.FinancialAid)))
+
+    def columns_fast(db):
+        rows = db.execute(select(*schema_columns(schemas.FinancialAid, models.FinancialAid))).all()
+        return dumps(rows_to_dicts(rows, schemas.FinancialAid))
+
+    results = {}
+    for name, fn in [("orm+validate", orm_validate), ("columns+model", columns_model), ("columns+fast", columns_fast)]:
+        timings = []
+        for _ in range(args.repeat):
+            with SessionLocal() as db:
+                start = time.perf_counter()
+                fn(db)
+                timings.append(time.perf_counter() - start)
+        results[name] = round(min(timings) * 1000, 2)
+
+    baseline = results["orm+validate"]
+    print(f"{args.rows} rows, best of {args.repeat}, orjson {'on' if orjson else 'missing'}")
+    for name, ms in results.items():
+        print(f"  {name:14s} {ms:10.2f} ms  x{baseline / ms:.2f}")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"rows": args.rows, "best_ms": results}, indent=2) + "\n")
+
+if __name__ == "__main__":
+    main()
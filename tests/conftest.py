@@ -0,0 +1,105 @@
+"""Fixtures: the app against a throwaway SQLite database, migrated to head.
+
+Settings are read at import, so the environment is set up before the app
+is imported. Every test works with its own users, so tests share one
+database without cleaning up between them.
+"""
+from pathlib import Path
+import itertools
+import os
+import tempfile
+
+DATABASE_DIR = Path(tempfile.mkdtemp(prefix="finaid-tests-"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DATABASE_DIR / 'test.db'}",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "2525",
+    "SMTP_USERNAME": "test",
+    "SMTP_PASSWORD": "test",
+    "BCRYPT_ROUNDS": "4",
+    "LOGIN_RATE_PER_MINUTE": "0",
+    "FORGOT_PASSWORD_RATE_PER_MINUTE": "0",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+PASSWORD = "password1"
+STUDENT_COLUMNS = "email,password,full_name,age,school,location,economic_status,disability_status\n"
+_ids = itertools.count()
+
+def unique_email(prefix: str) -> str:
+    return f"{prefix}{next(_ids)}@example.com"
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="session")
+def client():
+    from app.migrations import upgrade
+    upgrade()
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/admin/initial-admin", json={
+        "email": "admin@example.com", "password": PASSWORD, "full_name": "Admin", "user_type": "admin",
+    })
+    assert response.status_code == 201, response.text
+    return login(client, "admin@example.com")["headers"]
+
+def login(client, email: str, password: str = PASSWORD) -> dict:
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    tokens = response.json()
+    return {**tokens, "headers": bearer(tokens["access_token"])}
+
+def outbox_token(email: str, path: str) -> str:
+    """The token in the newest email queued for `email` with a link to `path`."""
+    from app.database import SessionLocal
+    from app.models import models
+
+    with SessionLocal() as db:
+        body = db.scalar(
+            select(models.EmailOutbox.body)
+            .where(models.EmailOutbox.to_email == email, models.EmailOutbox.body.contains(path))
+            .order_by(models.EmailOutbox.id.desc())
+        )
+    return body.split(path, 1)[1].split('"', 1)[0]
+
+@pytest.fixture
+def make_student(client, admin_headers):
+    """Import a student and return their id and a login: tokens, headers and email."""
+    def make(school: str = "Green Hills", location: str = "Kigali", economic_status: str = "poor"):
+        email = unique_email("student")
+        row = f"{email},{PASSWORD},Student {email},18,{school},{location},{economic_status},disabled\n"
+        response = client.post(
+            "/admin/students/import", files={"file": ("students.csv", STUDENT_COLUMNS + row)}, headers=admin_headers
+        )
+        assert response.json()["created"] == 1, response.text
+        from app.database import SessionLocal
+        from app.models import models
+        with SessionLocal() as db:
+            student_id = db.scalar(select(models.User.id).where(models.User.email == email))
+        return student_id, {**login(client, email), "email": email}
+    return make
+
+@pytest.fixture
+def manager_headers(client):
+    email = unique_email("manager")
+    response = client.post("/auth/register", json={
+        "email": email, "password": PASSWORD, "full_name": "Manager", "user_type": "manager",
+    })
+    assert response.status_code == 200, response.text
+    verified = client.get(f"/auth/verify-email/{outbox_token(email, '/auth/verify-email/')}")
+    assert verified.status_code == 200, verified.text
+    return login(client, email)["headers"]
+
+def apply(client, headers: dict, amount: int = 100, purpose: str = "tuition fees", **extra_headers):
+    return client.post("/students/apply", json={"amount": amount, "purpose": purpose}, headers={**headers, **extra_headers})
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from conftest import apply
+
+@pytest.fixture
+def group_commit(monkeypatch):
+    from app.group_commit import group_committer
+
+    monkeypatch.setattr("app.routers.students.GROUP_COMMIT", True)
+    # Long enough for every concurrent test request to join one batch
+    monkeypatch.setattr(group_committer, "linger", 0.5)
+    group_committer.stats.reset()
+    return group_committer
+
+def concurrently(calls):
+    with ThreadPoolExecutor(len(calls)) as pool:
+        return list(pool.map(lambda call: call(), calls))
+
+def test_each_caller_gets_its_own_row(client, make_student, group_commit, monkeypatch):
+    first_id, first = make_student()
+    second_id, second = make_student()
+    # Identical submissions included, which only the row position tells apart
+    submissions = [(first_id, first, 100, "books"), (first_id, first, 100, "books"),
+                   (second_id, second, 100, "books"), (second_id, second, 250, "rent"),
+                   (first_id, first, 300, "laptop"), (second_id, second, 100, "books")]
+    monkeypatch.setattr(group_commit, "max_batch", len(submissions))
+
+    responses = concurrently([
+        lambda session=session, amount=amount, purpose=purpose: apply(client, session["headers"], amount, purpose)
+        for _, session, amount, purpose in submissions
+    ])
+
+    assert [r.status_code for r in responses] == [200] * len(submissions)
+    for (student_id, _, amount, purpose), response in zip(submissions, responses):
+        body = response.json()
+        assert (body["student_id"], body["amount"], body["purpose"], body["status"]) == (student_id, amount, purpose, "pending")
+    assert len({r.json()["id"] for r in responses}) == len(submissions)
+    # One full batch, one commit
+    assert group_commit.stats.snapshot()["fills"] == {len(submissions): 1}
+    for student_id, session in ((first_id, first), (second_id, second)):
+        mine = client.get("/students/applications", headers=session["headers"]).json()
+        assert sorted(a["id"] for a in mine) == sorted(
+            r.json()["id"] for (owner, *_), r in zip(submissions, responses) if owner == student_id
+        )
+
+def test_concurrent_retries_of_one_key_create_one_application(client, make_student, group_commit, monkeypatch):
+    _, student = make_student()
+    monkeypatch.setattr(group_commit, "max_batch", 4)
+
+    responses = concurrently([
+        lambda: apply(client, student["headers"], 75, "exam fees", **{"Idempotency-Key": "burst"})
+        for _ in range(4)
+    ])
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert len({r.json()["id"] for r in responses}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 3
+    assert len(client.get("/students/applications", headers=student["headers"]).json()) == 1
@@ -0,0 +1,32 @@
+from conftest import apply
+
+def test_retry_with_same_key_replays_the_original_response(client, make_student):
+    _, student = make_student()
+    first = apply(client, student["headers"], 250, "laptop", **{"Idempotency-Key": "retry-1"})
+    retry = apply(client, student["headers"], 250, "laptop", **{"Idempotency-Key": "retry-1"})
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    applications = client.get("/students/applications", headers=student["headers"]).json()
+    assert [a["id"] for a in applications] == [first.json()["id"]]
+
+def test_reusing_a_key_with_another_body_is_rejected(client, make_student):
+    _, student = make_student()
+    assert apply(client, student["headers"], 100, "rent", **{"Idempotency-Key": "reused"}).status_code == 200
+
+    response = apply(client, student["headers"], 999, "rent", **{"Idempotency-Key": "reused"})
+
+    assert response.status_code == 422
+    assert len(client.get("/students/applications", headers=student["headers"]).json()) == 1
+
+def test_keys_are_scoped_to_the_student(client, make_student):
+    _, first = make_student()
+    _, second = make_student()
+
+    a = apply(client, first["headers"], **{"Idempotency-Key": "shared"})
+    b = apply(client, second["headers"], **{"Idempotency-Key": "shared"})
+
+    assert a.status_code == b.status_code == 200
+    assert a.json()["id"] != b.json()["id"]
+    assert "Idempotent-Replayed" not in b.headers
@@ -0,0 +1,32 @@
+from conftest import PASSWORD, STUDENT_COLUMNS, unique_email
+
+def upload(client, headers, body: bytes):
+    return client.post("/admin/students/import", files={"file": ("students.csv", body)}, headers=headers)
+
+def test_rows_are_numbered_by_physical_line(client, admin_headers):
+    rows = (
+        f'{unique_email("import")},{PASSWORD},"Two\nLines",18,School,Kigali,poor,disabled\n'
+        f"not-an-email,{PASSWORD},Broken,18,School,Kigali,poor,disabled\n"
+    )
+
+    response = upload(client, admin_headers, (STUDENT_COLUMNS + rows).encode("utf-8-sig"))
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert [error["row"] for error in response.json()["errors"]] == [4]
+
+def test_non_utf8_upload_is_a_400_naming_the_line(client, admin_headers):
+    rows = f'{unique_email("import")},{PASSWORD},René,18,School,Kigali,poor,disabled\n'
+
+    response = upload(client, admin_headers, (STUDENT_COLUMNS + rows).encode("latin-1"))
+
+    assert response.status_code == 400
+    assert "line 2" in response.json()["detail"]
+
+def test_unparseable_csv_is_a_400(client, admin_headers):
+    rows = f'{unique_email("import")},{PASSWORD},"{"x" * 200000}",18,School,Kigali,poor,disabled\n'
+
+    response = upload(client, admin_headers, (STUDENT_COLUMNS + rows).encode())
+
+    assert response.status_code == 400
+    assert "line 2" in response.json()["detail"]
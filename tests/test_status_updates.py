@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
+from conftest import apply
+
+def bulk(client, headers, **body):
+    return client.post("/managers/applications/status", json=body, headers=headers)
+
+def stats_snapshot() -> dict:
+    from app.database import SessionLocal
+    from app.models import models
+
+    with SessionLocal() as db:
+        rows = db.execute(select(
+            models.ApplicationStat.dimension, models.ApplicationStat.value, models.ApplicationStat.status,
+            models.ApplicationStat.count, models.ApplicationStat.total_amount,
+        )).all()
+    return {(d, v, s): (c, a) for d, v, s, c, a in rows if c or a}
+
+def test_bulk_update_reports_an_outcome_per_application(client, make_student, manager_headers):
+    _, student = make_student()
+    fresh, decided, stale = (apply(client, student["headers"], amount).json() for amount in (10, 20, 30))
+    assert bulk(client, manager_headers, status="rejected", applications=[{"id": decided["id"]}]).status_code == 200
+
+    response = bulk(client, manager_headers, status="approved", applications=[
+        {"id": fresh["id"], "updated_at": fresh["updated_at"]},
+        {"id": decided["id"]},
+        {"id": stale["id"], "updated_at": "2000-01-01T00:00:00"},
+        {"id": 10 ** 9},
+    ])
+
+    assert response.status_code == 200
+    assert response.json() == {"updated": 1, "results": [
+        {"id": fresh["id"], "outcome": "updated"},
+        {"id": decided["id"], "outcome": "not_pending"},
+        {"id": stale["id"], "outcome": "conflict"},
+        {"id": 10 ** 9, "outcome": "not_found"},
+    ]}
+
+def test_bulk_update_rejects_a_filter_without_criteria(client, make_student, manager_headers):
+    _, student = make_student()
+    application = apply(client, student["headers"]).json()
+
+    for empty in ({}, {"min_amount": None}):
+        assert bulk(client, manager_headers, status="approved", filter=empty).status_code == 422
+
+    statuses = {a["id"]: a["status"] for a in client.get("/students/applications", headers=student["headers"]).json()}
+    assert statuses[application["id"]] == "pending"
+
+def test_bulk_update_caps_filter_matches(client, make_student, manager_headers, monkeypatch):
+    student_id, student = make_student()
+    for amount in (1, 2, 3):
+        apply(client, student["headers"], amount)
+    monkeypatch.setattr("app.routers.managers.BULK_STATUS_FILTER_LIMIT", 2)
+
+    over = bulk(client, manager_headers, status="approved", filter={"student_id": student_id})
+    within = bulk(client, manager_headers, status="approved", filter={"student_id": student_id, "max_amount": 2})
+
+    assert over.status_code == 422
+    assert within.status_code == 200 and within.json()["updated"] == 2
+
+def test_single_update_of_a_missing_application_is_404(client, manager_headers):
+    response = client.put("/managers/applications/999999999/status", params={"status": "approved"}, headers=manager_headers)
+
+    assert response.status_code == 404
+
+def test_single_update_is_for_managers_only(client, make_student):
+    _, student = make_student()
+    application = apply(client, student["headers"]).json()
+
+    response = client.put(
+        f"/managers/applications/{application['id']}/status", params={"status": "approved"}, headers=student["headers"]
+    )
+
+    assert response.status_code == 403
+
+def test_incremental_stats_match_a_rebuild(client, make_student, manager_headers):
+    from app.stats import rebuild
+
+    students = [make_student(school=school, economic_status=economic)
+                for school, economic in (("Riviera", "rich"), ("Riviera", "poor"), ("Lycee", "medium"))]
+    applications = [apply(client, session["headers"], amount).json()
+                    for amount, (_, session) in zip((100, 200, 300, 400, 500, 600), students * 2)]
+
+    def put(args):
+        application, new_status = args
+        return client.put(
+            f"/managers/applications/{application['id']}/status", params={"status": new_status}, headers=manager_headers
+        ).status_code
+
+    # Competing single updates on the same rows, then a bulk update over what is left
+    jobs = [(a, s) for a in applications[:4] for s in ("approved", "rejected", "approved", "rejected")]
+    with ThreadPoolExecutor(8) as pool:
+        assert set(pool.map(put, jobs)) == {200}
+    assert bulk(client, manager_headers, status="approved",
+                applications=[{"id": a["id"]} for a in applications]).status_code == 200
+
+    incremental = stats_snapshot()
+    rebuild()
+    assert incremental == stats_snapshot()
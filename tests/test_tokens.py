@@ -0,0 +1,62 @@
+from conftest import PASSWORD, bearer, login
+
+def refresh(client, token: str):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+def test_refresh_rotates_the_token(client, make_student):
+    _, student = make_student()
+
+    response = refresh(client, student["refresh_token"])
+
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != student["refresh_token"]
+    assert client.get("/students/applications", headers=bearer(rotated["access_token"])).status_code == 200
+
+def test_reusing_a_refresh_token_revokes_its_family(client, make_student):
+    _, student = make_student()
+    rotated = refresh(client, student["refresh_token"]).json()
+
+    assert refresh(client, student["refresh_token"]).status_code == 401
+    # The legitimate successor dies with the family
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+
+def test_forged_refresh_token_is_rejected(client, make_student):
+    _, student = make_student()
+    value, _, _ = student["refresh_token"].rpartition(".")
+
+    assert refresh(client, f"{value}.forged").status_code == 401
+
+def test_logout_revokes_only_that_access_token(client, make_student):
+    _, student = make_student()
+    other_session = login(client, student["email"])
+
+    assert client.post("/auth/logout", headers=student["headers"]).status_code == 200
+
+    assert client.get("/students/applications", headers=student["headers"]).status_code == 401
+    assert client.get("/students/applications", headers=other_session["headers"]).status_code == 200
+
+def test_logout_with_refresh_token_revokes_it(client, make_student):
+    _, student = make_student()
+
+    response = client.post("/auth/logout", json={"refresh_token": student["refresh_token"]}, headers=student["headers"])
+
+    assert response.status_code == 200
+    assert refresh(client, student["refresh_token"]).status_code == 401
+
+def test_changing_password_revokes_every_token_of_the_user(client, make_student):
+    _, student = make_student()
+    other_session = login(client, student["email"])
+
+    response = client.post(
+        "/auth/change-password",
+        json={"current_password": PASSWORD, "new_password": "password2"},
+        headers=student["headers"],
+    )
+
+    assert response.status_code == 200
+    for session in (student, other_session):
+        assert client.get("/students/applications", headers=session["headers"]).status_code == 401
+        assert refresh(client, session["refresh_token"]).status_code == 401
+    fresh = login(client, student["email"], "password2")
+    assert client.get("/students/applications", headers=fresh["headers"]).status_code == 200